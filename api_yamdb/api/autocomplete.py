@@ -0,0 +1,211 @@
+"""
+Автодополнение названий по префиксу.
+
+Индексы произведений, жанров и категорий живут в памяти процесса:
+отсортированные ключи и bisect вместо запросов к БД. Сигналы
+(api.signals) отмечают изменения в общем для процессов кэше
+(``api.cache.shared_cache``), и каждый процесс догружает изменённые
+произведения по ``Title.updated_at``. Жанры и категории перечитываются
+отдельно и только при изменении их самих или состава их произведений.
+Метки проверяются не чаще раза в ``LOOKUP_VERSION_CHECK_INTERVAL``
+секунд, как и версии справочников. Удаление произведения перестраивает
+индекс целиком.
+"""
+import bisect
+import heapq
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from api.cache import shared_cache
+from api.filters import MAX_CHAR
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from reviews.models import Category, Genre, Title
+from reviews.search import make_search_key
+
+VERSION_KEY = 'autocomplete-version'
+CHANGED_KEY = 'autocomplete-changed'
+NAMES_CHANGED_KEY = 'autocomplete-names-changed'
+# запас на транзакции, зафиксированные позже, чем изменён updated_at
+SYNC_OVERLAP = timedelta(seconds=5)
+RESULT_CACHE_SIZE = 1024
+
+
+class PrefixIndex:
+    """
+    Отсортированный список ключей с поиском по префиксу через bisect.
+
+    Ключи строятся для каждого слова названия, поэтому «матр» находит и
+    «Тёмную матрицу». Совпадения упорядочены по ``rank`` (по убыванию),
+    затем по названию; готовые выдачи запоминаются до изменения индекса.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.entries = {}
+        self.results = {}
+
+    @staticmethod
+    def word_keys(name):
+        words = make_search_key(name).split(' ')
+        return tuple(dict.fromkeys(
+            ' '.join(words[start:]) for start in range(len(words))
+        ))
+
+    def load(self, rows):
+        """Заполняет индекс строками (id, название, ранг, элемент выдачи)."""
+        self.entries = {
+            pk: (self.word_keys(name), rank, item)
+            for pk, name, rank, item in rows
+        }
+        self.keys = sorted(
+            (key, pk)
+            for pk, (keys, _, _) in self.entries.items()
+            for key in keys
+        )
+        self.results = {}
+
+    def upsert(self, pk, name, rank, item):
+        self.remove(pk)
+        keys = self.word_keys(name)
+        for key in keys:
+            bisect.insort(self.keys, (key, pk))
+        self.entries[pk] = (keys, rank, item)
+        self.results = {}
+
+    def remove(self, pk):
+        entry = self.entries.pop(pk, None)
+        if entry is None:
+            return
+        for key in entry[0]:
+            del self.keys[bisect.bisect_left(self.keys, (key, pk))]
+        self.results = {}
+
+    def search(self, prefix, limit):
+        found = self.results.get((prefix, limit))
+        if found is None:
+            start = bisect.bisect_left(self.keys, (prefix,))
+            stop = bisect.bisect_left(self.keys, (prefix + MAX_CHAR,))
+            best = heapq.nsmallest(
+                limit,
+                {pk for _, pk in self.keys[start:stop]},
+                key=lambda pk: (
+                    -self.entries[pk][1], self.entries[pk][0][0], pk
+                )
+            )
+            found = [self.entries[pk][2] for pk in best]
+            if len(self.results) >= RESULT_CACHE_SIZE:
+                self.results = {}
+            self.results[prefix, limit] = found
+        return found
+
+
+def title_row(pk, name, review_count):
+    return pk, name, review_count, {
+        'id': pk, 'name': name, 'review_count': review_count
+    }
+
+
+def name_slug_rows(model, related_name):
+    """Жанры и категории ранжируются по числу произведений."""
+    return [
+        (pk, name, count, {'name': name, 'slug': slug})
+        for pk, name, slug, count in model.objects.annotate(
+            count=Count(related_name)
+        ).values_list('pk', 'name', 'slug', 'count')
+    ]
+
+
+class Autocomplete:
+    """Индексы процесса и их синхронизация с БД."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._changed = None
+        self._names_changed = None
+        self._checked_at = None
+        self._synced_at = None
+        self.titles = PrefixIndex()
+        self.genres = PrefixIndex()
+        self.categories = PrefixIndex()
+
+    def search(self, query, limit):
+        prefix = make_search_key(query)
+        with self._lock:
+            self._check_markers()
+            return {
+                'titles': self.titles.search(prefix, limit),
+                'genres': self.genres.search(prefix, limit),
+                'categories': self.categories.search(prefix, limit),
+            }
+
+    def _check_markers(self):
+        now = time.monotonic()
+        if self._checked_at is not None and (
+            now - self._checked_at < settings.LOOKUP_VERSION_CHECK_INTERVAL
+        ):
+            return
+        markers = shared_cache.get_many(
+            (VERSION_KEY, CHANGED_KEY, NAMES_CHANGED_KEY)
+        )
+        version = markers.get(VERSION_KEY)
+        if version is None:
+            shared_cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+            version = shared_cache.get(VERSION_KEY)
+        if version != self._version:
+            self._rebuild()
+        else:
+            if markers.get(CHANGED_KEY) != self._changed:
+                self._sync()
+            if markers.get(NAMES_CHANGED_KEY) != self._names_changed:
+                self._load_names()
+        self._version = version
+        self._changed = markers.get(CHANGED_KEY)
+        self._names_changed = markers.get(NAMES_CHANGED_KEY)
+        self._checked_at = now
+
+    def _rebuild(self):
+        self._synced_at = timezone.now()
+        self.titles.load(
+            title_row(*row)
+            for row in Title.objects.values_list('pk', 'name', 'review_count')
+        )
+        self._load_names()
+
+    def _sync(self):
+        """Догружает произведения, изменённые с прошлой синхронизации."""
+        started = timezone.now()
+        for row in Title.objects.filter(
+            updated_at__gte=self._synced_at - SYNC_OVERLAP
+        ).values_list('pk', 'name', 'review_count'):
+            self.titles.upsert(*title_row(*row))
+        self._synced_at = started
+
+    def _load_names(self):
+        self.genres.load(name_slug_rows(Genre, 'title'))
+        self.categories.load(name_slug_rows(Category, 'titles'))
+
+    # метки ставит и сам процесс, поэтому свою запись он видит сразу,
+    # не дожидаясь следующей проверки
+
+    def bump(self):
+        """Требует полной перестройки индексов во всех процессах."""
+        shared_cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+        self._checked_at = None
+
+    def mark_changed(self):
+        """Сообщает процессам, что пора догрузить произведения."""
+        shared_cache.set(CHANGED_KEY, uuid.uuid4().hex, None)
+        self._checked_at = None
+
+    def mark_names_changed(self):
+        """Сообщает процессам, что пора перечитать жанры и категории."""
+        shared_cache.set(NAMES_CHANGED_KEY, uuid.uuid4().hex, None)
+        self._checked_at = None
+
+
+autocomplete = Autocomplete()
@@ -0,0 +1,124 @@
+"""Кэши API: фрагменты ответа с произведениями и справочники."""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.connection import ConnectionProxy
+from reviews.models import Category, Genre
+
+# общий для всех процессов кэш версий (см. CACHES['shared'])
+shared_cache = ConnectionProxy(caches, 'shared')
+
+TITLE_FRAGMENT_KEY = 'title-fragment:{}'
+LOOKUP_VERSION_KEY = 'lookup-version:{}'
+
+
+def title_version(title, versions):
+    # updated_at меняется при любом изменении представления произведения;
+    # жанры и категория берутся из справочников, которые в других
+    # процессах могут отставать, поэтому их версии тоже входят в ключ
+    return '|'.join((
+        title.updated_at.isoformat() if title.updated_at else '',
+        *versions,
+    ))
+
+
+def get_title_fragments(titles, versions):
+    """Сериализованные произведения из кэша: {id: dict} для попаданий."""
+    keys = {TITLE_FRAGMENT_KEY.format(title.pk): title for title in titles}
+    fragments = {}
+    for key, (version, data) in cache.get_many(keys).items():
+        title = keys[key]
+        if version == title_version(title, versions):
+            fragments[title.pk] = data
+    return fragments
+
+
+def set_title_fragments(titles, fragments, versions):
+    """``versions`` — версии справочников, снятые до сериализации."""
+    cache.set_many(
+        {
+            TITLE_FRAGMENT_KEY.format(title.pk): (
+                title_version(title, versions), fragments[title.pk]
+            )
+            for title in titles
+        },
+        settings.TITLE_FRAGMENT_TIMEOUT
+    )
+
+
+def invalidate_title_fragments(title_ids):
+    cache.delete_many(
+        [TITLE_FRAGMENT_KEY.format(title_id) for title_id in title_ids]
+    )
+
+
+class LookupCache:
+    """
+    Справочник slug → объект в памяти процесса.
+
+    Таблица целиком перечитывается, только когда меняется её версия в
+    ``shared_cache``. Версию поднимает ``bump()`` после каждой записи,
+    и этот кэш общий для процессов, поэтому перечитывают её и остальные
+    воркеры. Сама версия проверяется не чаще раза в
+    ``LOOKUP_VERSION_CHECK_INTERVAL`` секунд, а не при каждом обращении.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = LOOKUP_VERSION_KEY.format(model._meta.label_lower)
+        # версия, {slug: объект}, {pk: объект}; заменяются одним присваиванием
+        self._state = (None, {}, {})
+        self._checked_at = None
+
+    def current_version(self):
+        version = shared_cache.get(self.version_key)
+        if version is None:
+            shared_cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = shared_cache.get(self.version_key)
+        return version
+
+    def load(self):
+        now = time.monotonic()
+        if self._state[0] is not None and (
+            now - self._checked_at < settings.LOOKUP_VERSION_CHECK_INTERVAL
+        ):
+            return self._state
+        version = self.current_version()
+        self._checked_at = now
+        if version != self._state[0]:
+            objects = list(self.model.objects.all())
+            self._state = (
+                version,
+                {instance.slug: instance for instance in objects},
+                {instance.pk: instance for instance in objects},
+            )
+        return self._state
+
+    def get(self, pk):
+        return self.load()[2].get(pk)
+
+    def get_many_by_slug(self, slugs):
+        """Объекты по слагам; отсутствующие в справочнике ищутся в БД."""
+        by_slug = self.load()[1]
+        found = {slug: by_slug[slug] for slug in slugs if slug in by_slug}
+        missing = set(slugs) - set(found)
+        if missing:
+            found.update(
+                self.model.objects.in_bulk(missing, field_name='slug')
+            )
+        return found
+
+    def bump(self):
+        self._state = (None, {}, {})
+        shared_cache.set(self.version_key, uuid.uuid4().hex, None)
+
+
+genre_lookup = LookupCache(Genre)
+category_lookup = LookupCache(Category)
+
+
+def lookup_versions():
+    """Версии справочников, из которых собраны жанры и категории ответа."""
+    return (genre_lookup.load()[0], category_lookup.load()[0])
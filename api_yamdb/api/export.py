@@ -0,0 +1,91 @@
+"""
+Потоковая выгрузка отзывов и комментариев (NDJSON и CSV).
+
+Записи читаются через ``.iterator()`` порциями по ``EXPORT_CHUNK_SIZE``
+и сразу отдаются клиенту, поэтому память не зависит от размера таблиц.
+Порядок — по ``updated_at`` и ``id``: для следующей выгрузки достаточно
+передать ``since`` с датой изменения последней полученной записи.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.conf import settings
+from reviews.models import Comment, Review
+
+# тип записи: модель и выгружаемые поля (имя в выгрузке -> путь в ORM)
+EXPORT_SOURCES = {
+    'review': (Review, {
+        'id': 'id',
+        'title_id': 'title_id',
+        'author': 'author__username',
+        'score': 'score',
+        'text': 'text',
+        'comment_count': 'comment_count',
+        'pub_date': 'pub_date',
+        'updated_at': 'updated_at',
+    }),
+    'comment': (Comment, {
+        'id': 'id',
+        'title_id': 'review__title_id',
+        'review_id': 'review_id',
+        'author': 'author__username',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'updated_at': 'updated_at',
+    }),
+}
+CSV_COLUMNS = (
+    'type', 'id', 'title_id', 'review_id', 'author', 'score', 'text',
+    'comment_count', 'pub_date', 'updated_at'
+)
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_records(kinds, since=None):
+    """Записи выбранных типов словарями, по одному запросу на тип."""
+    for kind in kinds:
+        model, fields = EXPORT_SOURCES[kind]
+        queryset = model.objects.order_by('updated_at', 'id')
+        if since is not None:
+            queryset = queryset.filter(updated_at__gte=since)
+        for row in queryset.values_list(*fields.values()).iterator(
+            chunk_size=settings.EXPORT_CHUNK_SIZE
+        ):
+            yield {
+                'type': kind,
+                **{
+                    name: export_value(value)
+                    for name, value in zip(fields, row)
+                },
+            }
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: строка возвращается как есть."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(records):
+    writer = csv.DictWriter(Echo(), fieldnames=CSV_COLUMNS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+EXPORT_OUTPUTS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson; charset=utf-8'),
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+}
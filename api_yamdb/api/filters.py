@@ -1,13 +1,119 @@
+from django.db.models import Count
+from django.db.models.expressions import RawSQL
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
 from reviews.models import Title
+from reviews.search import (TITLE_SEARCH_TABLE, build_match_query,
+                            build_search_query, get_search_keys,
+                            make_search_key, search_available)
+
+# Верхняя граница для диапазона строк, начинающихся с заданного префикса
+MAX_CHAR = chr(0x10FFFF)
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    """Список строк через запятую: ``?genre=drama,comedy``."""
 
 
 class TitleFilter(filters.FilterSet):
-    genre = filters.CharFilter(field_name='genre__slug')
-    category = filters.CharFilter(field_name='category__slug')
+    MATCH_ANY = 'any'
+    MATCH_ALL = 'all'
+
+    genre = CharInFilter(method='filter_genre')
+    genre_match = filters.ChoiceFilter(
+        choices=((MATCH_ANY, 'Любой из жанров'), (MATCH_ALL, 'Все жанры')),
+        method='filter_genre_match'
+    )
+    category = CharInFilter(field_name='category__slug', lookup_expr='in')
     year = filters.NumberFilter(field_name='year')
-    name = filters.CharFilter(field_name='name')
+    year_min = filters.NumberFilter(field_name='year', lookup_expr='gte')
+    year_max = filters.NumberFilter(field_name='year', lookup_expr='lte')
+    rating_min = filters.NumberFilter(field_name='rating', lookup_expr='gte')
+    rating_max = filters.NumberFilter(field_name='rating', lookup_expr='lte')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Title
-        fields = ('genre', 'category', 'name', 'year')
+        fields = (
+            'genre', 'genre_match', 'category', 'name', 'year',
+            'year_min', 'year_max', 'rating_min', 'rating_max'
+        )
+
+    def filter_genre(self, queryset, name, value):
+        """
+        Произведения с любым (по умолчанию) или со всеми жанрами списка.
+
+        Отбор идёт подзапросом по таблице связей, поэтому произведение
+        с несколькими подходящими жанрами не дублируется в выдаче.
+        """
+        links = Title.genre.through.objects.filter(genre__slug__in=value)
+        if self.form.cleaned_data.get('genre_match') == self.MATCH_ALL:
+            links = (
+                links
+                .values('title')
+                .annotate(matched=Count('genre', distinct=True))
+                .filter(matched=len(set(value)))
+            )
+        return queryset.filter(pk__in=links.values('title'))
+
+    def filter_genre_match(self, queryset, name, value):
+        # режим учитывается в filter_genre
+        return queryset
+
+    def filter_name(self, queryset, name, value):
+        """Точное совпадение названия без учёта регистра."""
+        return queryset.filter(search_name=make_search_key(value))
+
+
+class NameSearchFilter(SearchFilter):
+    """
+    Поиск по началу названия через индексированный ключ ``search_name``.
+
+    Префикс превращается в диапазон строк, поэтому запрос использует
+    индекс и корректно работает с кириллицей в любом регистре.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        prefix = make_search_key(' '.join(search_terms))
+        return queryset.filter(
+            search_name__gte=prefix, search_name__lt=prefix + MAX_CHAR
+        )
+
+
+class TitleSearchFilter(SearchFilter):
+    """
+    Поиск произведений по полнотекстовому индексу FTS5.
+
+    Параметр ``search`` прежний: каждое слово ищется как подстрока без
+    учёта регистра и различия «е»/«ё». Результаты упорядочены по BM25.
+    Если индекс недоступен, используется обычный поиск по
+    ``search_fields``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not get_search_keys(search_terms) or not search_available(
+            queryset.db
+        ):
+            return super().filter_queryset(request, queryset, view)
+        queryset = queryset.filter(pk__in=RawSQL(
+            *build_search_query(search_terms)
+        ))
+        match = build_match_query(search_terms)
+        if match is None:
+            # по одним коротким словам ранжировать нечем
+            return queryset
+        return (
+            queryset
+            .annotate(search_rank=RawSQL(
+                f'SELECT bm25({TITLE_SEARCH_TABLE}) '
+                f'FROM {TITLE_SEARCH_TABLE} '
+                f'WHERE {TITLE_SEARCH_TABLE} MATCH %s '
+                f'AND rowid = {queryset.model._meta.db_table}.id',
+                (match,)
+            ))
+            .order_by('search_rank', *queryset.query.order_by)
+        )
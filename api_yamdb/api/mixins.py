@@ -0,0 +1,252 @@
+import hashlib
+
+from api.cache import (get_title_fragments, lookup_versions,
+                       set_title_fragments)
+from api.serializers import is_field_requested
+from django.db.models import Count, Max, prefetch_related_objects
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ConditionalResponseMixin:
+    """
+    ETag и Last-Modified для list и retrieve.
+
+    Валидаторы считаются по полю ``updated_at`` без сериализации: для
+    списка — одним агрегатом (максимум и количество) по отфильтрованному
+    запросу, для объекта — по уже загруженной записи. Если клиент
+    прислал совпадающий If-None-Match или If-Modified-Since, отдаётся 304
+    без запуска сериализатора.
+
+    If-Modified-Since для списков не проверяется: удаление записи не
+    меняет максимум ``updated_at``, это видно только по ETag.
+    """
+
+    last_modified_field = 'updated_at'
+
+    def conditional_response(self, request, last_modified, state, respond,
+                             check_modified_since=True):
+        etag = self.make_etag(request, last_modified, state)
+        if self.is_not_modified(
+            request, etag, last_modified if check_modified_since else None
+        ):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = respond()
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(
+                    last_modified.timestamp()
+                )
+        return response
+
+    @staticmethod
+    def make_etag(request, last_modified, state):
+        """Слабый ETag: состояние данных плюс параметры страницы."""
+        source = '|'.join(map(str, (
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            last_modified.isoformat() if last_modified else '',
+            *state,
+        )))
+        return 'W/"{}"'.format(hashlib.md5(source.encode()).hexdigest())
+
+    @staticmethod
+    def is_not_modified(request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # слабое сравнение: префикс W/ не учитывается
+            tags = {
+                tag.strip().replace('W/', '', 1)
+                for tag in if_none_match.split(',')
+            }
+            return '*' in tags or etag.replace('W/', '', 1) in tags
+        if_modified_since = parse_http_date_safe(
+            request.headers.get('If-Modified-Since') or ''
+        )
+        return (
+            last_modified is not None
+            and if_modified_since is not None
+            and int(last_modified.timestamp()) <= if_modified_since
+        )
+
+
+class ConditionalListMixin(ConditionalResponseMixin):
+    """
+    Условный GET для списков.
+
+    Если пагинации не нужен точный COUNT(*) (``?count=false``,
+    ``?count=estimate``, keyset), агрегат по всему запросу не строится:
+    сначала выбирается страница, а валидаторы считаются по её записям.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = self.paginator
+        if paginator is not None and not getattr(
+            paginator, 'count_required', lambda request: True
+        )(request):
+            return self.list_page(request, queryset)
+        state = queryset.order_by().aggregate(
+            last_modified=Max(self.last_modified_field), count=Count('pk')
+        )
+        # количество пригодится пагинации (KnownCountPagination)
+        self.list_count = state['count']
+        return self.conditional_response(
+            request,
+            state['last_modified'],
+            (state['count'],),
+            lambda: self.list_response(queryset),
+            check_modified_since=False
+        )
+
+    def list_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.serialize_page(queryset))
+        return self.get_paginated_response(self.serialize_page(page))
+
+    def list_page(self, request, queryset):
+        page = self.paginate_queryset(queryset)
+        versions = [
+            (instance.pk, getattr(instance, self.last_modified_field))
+            for instance in page
+        ]
+        return self.conditional_response(
+            request,
+            max((version for _, version in versions), default=None),
+            (*versions, *self.paginator.get_state()),
+            lambda: self.get_paginated_response(self.serialize_page(page))
+        )
+
+    def serialize_page(self, page):
+        return self.get_serializer(page, many=True).data
+
+
+class ConditionalRetrieveMixin(ConditionalResponseMixin):
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.conditional_response(
+            request,
+            getattr(instance, self.last_modified_field),
+            (instance.pk,),
+            lambda: Response(self.serialize_object(instance))
+        )
+
+    def serialize_object(self, instance):
+        return self.get_serializer(instance).data
+
+
+class ConditionalGetMixin(ConditionalListMixin, ConditionalRetrieveMixin):
+    pass
+
+
+class SparseFieldsQuerysetMixin:
+    """
+    Сужает запрос под ``?fields=``/``?exclude=`` (см. SparseFieldsMixin).
+
+    Связи из ``select_related_fields``/``prefetch_related_fields`` (имена
+    или объекты Prefetch) грузятся, только если соответствующее поле
+    попадёт в ответ, а тяжёлые колонки из ``deferrable_fields`` в этом
+    случае откладываются через defer().
+    """
+
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    deferrable_fields = ()
+
+    def narrow_queryset(self, queryset):
+        context = {'request': self.request}
+        deferred = [
+            name for name in self.deferrable_fields
+            if not is_field_requested(context, name)
+        ]
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        return (
+            queryset
+            .select_related(*(
+                name for name in self.select_related_fields
+                if is_field_requested(context, name)
+            ))
+            .prefetch_related(*(
+                lookup for lookup in self.prefetch_related_fields
+                # Prefetch() называется по пути, который он заполняет
+                if is_field_requested(
+                    context, getattr(lookup, 'prefetch_to', lookup)
+                )
+            ))
+        )
+
+
+class TitleFragmentCacheMixin(ConditionalGetMixin):
+    """
+    Ответы с произведениями собираются из закэшированных фрагментов.
+
+    Связи из ``prefetch_related_fields`` подгружаются только для промахов
+    кэша, при полном попадании страница отдаётся без запросов за жанрами.
+    Версия фрагмента — ``updated_at``, поэтому устаревшая запись кэша
+    не будет использована, даже если сигнал об изменении потерялся.
+    Выборка полей (?fields=, ?exclude=, ?include=) идёт мимо кэша: такие
+    ответы не читаются из него и не записываются в него.
+    """
+
+    def conditional_response(self, request, last_modified, state, *args,
+                             **kwargs):
+        # жанры и категории в ответе зависят от версий справочников
+        return super().conditional_response(
+            request, last_modified, (*state, *lookup_versions()),
+            *args, **kwargs
+        )
+
+    def fields_selected(self):
+        return any(
+            param in self.request.query_params
+            for param in ('fields', 'exclude', 'include')
+        )
+
+    def fragments_usable(self):
+        return self.action in ('list', 'retrieve') and (
+            not self.fields_selected()
+        )
+
+    def narrow_queryset(self, queryset):
+        queryset = super().narrow_queryset(queryset)
+        if self.fragments_usable():
+            return queryset.prefetch_related(None)
+        return queryset
+
+    def serialize_page(self, page):
+        if not self.fragments_usable():
+            return super().serialize_page(page)
+        return self.get_fragments(page)
+
+    def serialize_object(self, instance):
+        if not self.fragments_usable():
+            return super().serialize_object(instance)
+        return self.get_fragments((instance,))[0]
+
+    def get_fragments(self, titles):
+        """Сериализованные произведения в порядке ``titles``."""
+        titles = list(titles)
+        if self.fields_selected():
+            prefetch_related_objects(titles, *self.prefetch_related_fields)
+            return [self.get_serializer(title).data for title in titles]
+        # снимаются до сериализации: если справочник перечитается по ходу,
+        # фрагмент с новыми данными получит старую версию и просто
+        # пересоберётся, а не наоборот
+        versions = lookup_versions()
+        fragments = get_title_fragments(titles, versions)
+        missing = [title for title in titles if title.pk not in fragments]
+        if missing:
+            prefetch_related_objects(missing, *self.prefetch_related_fields)
+            fresh = {
+                title.pk: dict(self.get_serializer(title).data)
+                for title in missing
+            }
+            set_title_fragments(missing, fresh, versions)
+            fragments.update(fresh)
+        return [fragments[title.pk] for title in titles]
@@ -0,0 +1,318 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Пагинация по ключу сортировки (keyset).
+
+    Страница выбирается условием на значения полей ``ordering`` у последней
+    показанной записи, поэтому запрос не зависит от глубины листания,
+    а COUNT(*) не выполняется вовсе. Последним полем сортировки должен
+    быть уникальный ключ, чтобы порядок был строгим.
+    """
+
+    ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.clean_position(queryset.model, position)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        self.page = results[:page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return self.first_page_link()
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.first_page_link()
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def first_page_link(self):
+        # у пустой страницы нет записи для курсора; пустой cursor
+        # оставляет клиента в режиме курсорной пагинации
+        return replace_query_param(self.base_url, self.cursor_query_param, '')
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict((
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        )))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def decode_cursor(self, request):
+        """Возвращает позицию и направление из параметра запроса."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(
+                base64.urlsafe_b64decode(encoded.encode('ascii'))
+            )
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+            len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def clean_position(self, model, position):
+        """Приводит значения курсора к типам полей сортировки."""
+        cleaned = []
+        for field, value in zip(self.ordering, position):
+            try:
+                value = model._meta.get_field(
+                    field.lstrip('-')
+                ).to_python(value)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            cleaned.append(value)
+        return cleaned
+
+    def encode_cursor(self, instance, reverse):
+        position = [
+            self._to_json(getattr(instance, field.lstrip('-')))
+            for field in self.ordering
+        ]
+        encoded = base64.urlsafe_b64encode(
+            json.dumps({'p': position, 'r': int(reverse)}).encode('utf-8')
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    @staticmethod
+    def _to_json(value):
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _after(ordering, position):
+        """Условие «строго после позиции» для составного ключа."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        # нестрогая граница по первому полю позволяет СУБД начать
+        # просмотр индекса сразу с нужной позиции
+        first, value = ordering[0], position[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': value}) & condition
+
+
+class KnownCountPagination(pagination.LimitOffsetPagination):
+    """
+    LimitOffsetPagination с управляемым подсчётом записей.
+
+    Параметр ``count`` выбирает, откуда берётся ``count`` в ответе:
+    ``true`` (по умолчанию) — точный COUNT(*), ``estimate`` — значение,
+    закэшированное для того же запроса на ``LIST_COUNT_CACHE_TIMEOUT``
+    секунд, ``false`` — поле не возвращается вовсе. Без точного числа
+    ссылка ``next`` определяется выборкой ``limit + 1`` строк.
+
+    Если вьюсет уже посчитал записи (``list_count``, см.
+    ConditionalListMixin), это число используется вместо отдельного запроса.
+    """
+
+    count_query_param = 'count'
+    count_cache_key = 'list-count:{}'
+
+    def get_count_mode(self, request):
+        value = request.query_params.get(self.count_query_param, '')
+        value = value.strip().lower()
+        if value in ('false', '0', 'no'):
+            return 'skip'
+        if value == 'estimate':
+            return 'estimate'
+        return 'exact'
+
+    def count_required(self, request):
+        """Нужен ли точный COUNT(*) для ответа."""
+        return self.get_count_mode(request) == 'exact'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.known_count = getattr(view, 'list_count', None)
+        self.count_mode = self.get_count_mode(request)
+        if self.count_mode == 'exact':
+            self.has_next = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        self.count = (
+            self.get_estimated_count(queryset)
+            if self.count_mode == 'estimate' else None
+        )
+        return results[:self.limit]
+
+    def get_count(self, queryset):
+        if self.known_count is not None:
+            return self.known_count
+        return super().get_count(queryset)
+
+    def get_estimated_count(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        key = self.count_cache_key.format(
+            hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+        )
+        count = cache.get(key)
+        if count is None:
+            count = self.get_count(queryset)
+            cache.set(key, count, settings.LIST_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_state(self):
+        """Признаки страницы, которые не видны по её записям (для ETag)."""
+        return (self.count, self.has_next)
+
+    def get_next_link(self):
+        if self.has_next is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            replace_query_param(
+                self.request.build_absolute_uri(),
+                self.limit_query_param, self.limit
+            ),
+            self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_paginated_response(self, data):
+        if self.count_mode != 'skip':
+            return super().get_paginated_response(data)
+        return Response(OrderedDict((
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        )))
+
+
+class OptionalKeysetPagination(KnownCountPagination):
+    """
+    LimitOffsetPagination с переключением на keyset по запросу.
+
+    Если в запросе передан параметр ``cursor`` (для первой страницы —
+    пустой), страница строится через ``KeysetPagination`` по полям
+    ``keyset_ordering``. Иначе поведение прежнее.
+    """
+
+    keyset_ordering = ('-id',)
+
+    def use_keyset(self, request):
+        return KeysetPagination.cursor_query_param in request.query_params
+
+    def count_required(self, request):
+        return not self.use_keyset(request) and super().count_required(
+            request
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination()
+            self.keyset.ordering = self.keyset_ordering
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_state(self):
+        if self.keyset is not None:
+            return (self.keyset.has_next, self.keyset.has_previous)
+        return super().get_state()
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class TitlePagination(OptionalKeysetPagination):
+    """Пагинация произведений: новые сначала, при равном годе — по id."""
+
+    keyset_ordering = ('-year', '-id')
+
+
+class FeedPagination(OptionalKeysetPagination):
+    """Пагинация отзывов и комментариев: новые сначала, затем по id."""
+
+    keyset_ordering = ('-pub_date', '-id')
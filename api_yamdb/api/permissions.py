@@ -43,3 +43,13 @@ class AdminOnly(permissions.BasePermission):
                 or request.user.is_admin
             )
         )
+
+
+class AdminOrModeratorOnly(permissions.BasePermission):
+    """Только администратор или модератор."""
+
+    def has_permission(self, request, view):
+        return (
+            request.user.is_authenticated
+            and (request.user.is_admin or request.user.is_moderator)
+        )
@@ -1,16 +1,192 @@
+import re
+
+from api.cache import category_lookup, genre_lookup
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
-from rest_framework import serializers
+from django.utils import timezone
+from rest_framework import permissions, serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
 from rest_framework_simplejwt.tokens import RefreshToken
+from reviews import search
 from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.signals import titles_changed
 from users.models import REGEX_USERNAME, RoleChoices
 
 User = get_user_model()
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+def get_query_list(context, param):
+    """Значения параметра запроса вида ``?param=a,b``."""
+    request = context.get('request')
+    if request is None:
+        return set()
+    return {
+        value.strip()
+        for value in request.query_params.get(param, '').split(',')
+        if value.strip()
+    }
+
+
+def get_included_fields(context):
+    """Необязательные поля, запрошенные через ``?include=a,b``."""
+    return get_query_list(context, 'include')
+
+
+def is_field_requested(context, name):
+    """
+    Нужно ли поле в ответе с учётом ``?fields=`` и ``?exclude=``.
+
+    Выборка полей действует только на чтение: при записи сериализатор
+    должен видеть все поля.
+    """
+    request = context.get('request')
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return True
+    fields = get_query_list(context, 'fields')
+    return (
+        (not fields or name in fields)
+        and name not in get_query_list(context, 'exclude')
+    )
+
+
+class SparseFieldsMixin:
+    """Оставляет в ответе только поля, запрошенные через ?fields=/?exclude=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in list(self.fields):
+            if not is_field_requested(self.context, name):
+                self.fields.pop(name)
+
+
+# столбцы из текста ошибки уникальности SQLite и PostgreSQL
+CONSTRAINT_COLUMNS = re.compile(
+    r'UNIQUE constraint failed: (.+)$'
+    r'|duplicate key value.*Key \((.+?)\)=',
+    re.DOTALL
+)
+
+
+def get_violated_columns(error):
+    """Столбцы нарушенного ограничения уникальности из текста ошибки."""
+    match = CONSTRAINT_COLUMNS.search(str(error))
+    if match is None:
+        return set()
+    return {
+        column.strip().rsplit('.', 1)[-1]
+        for column in (match.group(1) or match.group(2)).split(',')
+    }
+
+
+class UniqueConstraintMixin:
+    """
+    Уникальность проверяется самой БД, а не запросом перед записью.
+
+    Запись выполняется сразу, а ``IntegrityError`` переводится в ошибку
+    валидации: ограничение из ``Meta.constraints`` — по сообщению из
+    ``unique_error_messages``, уникальное поле — по его ``error_messages``.
+    Проверочные ``UniqueValidator`` для уникальных полей не создаются;
+    остальные уникальные поля проверяются одним запросом только после
+    неудачной записи, чтобы в ответе были все занятые значения.
+    """
+
+    unique_error_messages = {}
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, field_kwargs = super().build_standard_field(
+            field_name, model_field
+        )
+        if 'validators' in field_kwargs:
+            field_kwargs['validators'] = [
+                validator for validator in field_kwargs['validators']
+                if not isinstance(validator, UniqueValidator)
+            ]
+        return field_class, field_kwargs
+
+    def get_unique_error(self, error):
+        opts = self.Meta.model._meta
+        columns = get_violated_columns(error)
+        for constraint in opts.constraints:
+            message = self.unique_error_messages.get(constraint.name)
+            if message is not None and (
+                constraint.name in str(error)
+                or columns == {
+                    opts.get_field(name).column
+                    for name in getattr(constraint, 'fields', ())
+                }
+            ):
+                return {api_settings.NON_FIELD_ERRORS_KEY: [message]}
+        for field in self.get_unique_fields():
+            if columns == {field.column}:
+                return {field.name: [self.get_unique_message(field)]}
+        return None
+
+    def get_unique_fields(self):
+        return [
+            field for field in self.Meta.model._meta.concrete_fields
+            if field.unique and not field.primary_key
+        ]
+
+    def get_unique_message(self, field):
+        return field.error_messages['unique'] % {
+            'model_name': self.Meta.model._meta.verbose_name,
+            'field_label': field.verbose_name,
+        }
+
+    def get_other_unique_errors(self, detail):
+        """Занятые значения уникальных полей, о которых БД не сообщила."""
+        values = {
+            field.name: self.validated_data[field.name]
+            for field in self.get_unique_fields()
+            if field.name in self.validated_data and field.name not in detail
+        }
+        if not values:
+            return {}
+        condition = Q()
+        for name, value in values.items():
+            condition |= Q(**{name: value})
+        queryset = self.Meta.model.objects.filter(condition)
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        taken = list(queryset.values(*values))
+        return {
+            field.name: [self.get_unique_message(field)]
+            for field in self.get_unique_fields()
+            if field.name in values and any(
+                row[field.name] == values[field.name] for row in taken
+            )
+        }
+
+    def save_or_translate(self, save, *args):
+        try:
+            # точка сохранения: после ошибки транзакция запроса цела
+            with transaction.atomic():
+                return save(*args)
+        except IntegrityError as error:
+            detail = self.get_unique_error(error)
+            if detail is None:
+                raise
+            detail.update(self.get_other_unique_errors(detail))
+            raise ValidationError(detail)
+
+    def create(self, validated_data):
+        return self.save_or_translate(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self.save_or_translate(
+            super().update, instance, validated_data
+        )
+
+
+class ReviewSerializer(
+    UniqueConstraintMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     author = serializers.SlugRelatedField(
         read_only=True,
         slug_field='username'
@@ -18,26 +194,32 @@ class ReviewSerializer(serializers.ModelSerializer):
     pub_date = serializers.DateTimeField(read_only=True)
     id = serializers.IntegerField(read_only=True)
 
+    # один пользователь — один отзыв на произведение
+    unique_error_messages = {
+        'unique_review': 'Вы уже оставили отзыв на это произведение.'
+    }
+
     class Meta:
         model = Review
-        fields = ('id', 'text', 'author', 'score', 'pub_date')
+        fields = (
+            'id', 'text', 'author', 'score', 'pub_date', 'comment_count'
+        )
+        read_only_fields = ('comment_count',)
 
-    def validate(self, data):
-        """Проверка: один отзыв на одно произведение от одного пользователя."""
-        request = self.context['request']
-        title_id = self.context['view'].kwargs.get('title_id')
-
-        if request.method == 'POST':
-            title = get_object_or_404(Title, id=title_id)
-            author = request.user
-            if title.reviews.filter(author=author).exists():
-                raise serializers.ValidationError(
-                    'Вы уже оставили отзыв на это произведение.'
-                )
-        return data
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        if 'comments_preview' in get_included_fields(self.context) and (
+            hasattr(instance, 'comments_preview')
+        ):
+            # последние комментарии загружает вьюсет одним запросом на
+            # страницу (см. ReviewViewSet.attach_comments_preview)
+            representation['comments_preview'] = CommentSerializer(
+                instance.comments_preview, many=True
+            ).data
+        return representation
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True,
         slug_field='username'
@@ -50,25 +232,64 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ('id', 'text', 'author', 'pub_date')
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
-        exclude = ('id',)
+        fields = ('name', 'slug')
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Сериализатор для жанра
     class Meta:
         model = Genre
-        exclude = ('id',)
+        fields = ('name', 'slug')
+
+
+class CachedSlugRelatedField(serializers.SlugRelatedField):
+    """
+    Связь со справочником через его кэш в памяти процесса.
+
+    Слаги при записи и объекты при чтении берутся из ``lookup``, в ответ
+    попадает представление ``representation_class``. Из БД нужен только
+    id связанного объекта.
+    """
+
+    lookup = None
+    representation_class = None
+
+    def use_pk_only_optimization(self):
+        return True
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            instance = self.lookup.get_many_by_slug((data,)).get(data)
+            if instance is not None:
+                return instance
+        return super().to_internal_value(data)
+
+    def to_representation(self, value):
+        instance = self.lookup.get(value.pk)
+        if instance is None:
+            instance = self.get_queryset().get(pk=value.pk)
+        return self.representation_class(instance).data
+
+
+class GenreField(CachedSlugRelatedField):
+    lookup = genre_lookup
+    representation_class = GenreSerializer
+
+
+class CategoryField(CachedSlugRelatedField):
+    lookup = category_lookup
+    representation_class = CategorySerializer
 
 
-class TitleSerializer(serializers.ModelSerializer):
-    category = serializers.SlugRelatedField(
+class TitleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    category = CategoryField(
         slug_field='slug', queryset=Category.objects.all()
     )
     rating = serializers.IntegerField(read_only=True)
-    genre = serializers.SlugRelatedField(
+    genre = GenreField(
         slug_field='slug',
         queryset=Genre.objects.all(),
         many=True,
@@ -77,18 +298,205 @@ class TitleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = (
+            'id', 'name', 'year', 'rating', 'description', 'genre', 'category'
+        )
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['genre'] = GenreSerializer(
-            instance.genre.all(), many=True
-        ).data
-        representation['category'] = CategorySerializer(instance.category).data
+        if 'score_histogram' in get_included_fields(self.context):
+            representation['score_histogram'] = instance.score_histogram
         return representation
 
 
-class UsersSerializer(serializers.ModelSerializer):
+class TitleBulkItemSerializer(serializers.ModelSerializer):
+    """
+    Произведение в пакетной загрузке.
+
+    Слаги жанров и категорий, а также изменяемые произведения загружаются
+    один раз на весь пакет (см. ``preload``) и передаются через context.
+    Элемент с ``id`` изменяет существующее произведение, без — создаёт.
+    """
+
+    id = serializers.IntegerField(required=False)
+    genre = serializers.ListField(
+        child=serializers.SlugField(), allow_empty=True
+    )
+    category = serializers.SlugField()
+
+    class Meta:
+        model = Title
+        fields = ('id', 'name', 'year', 'description', 'genre', 'category')
+
+    @staticmethod
+    def preload(items):
+        """Загружает всё, на что ссылаются элементы пакета."""
+        genre_slugs, category_slugs, title_ids = set(), set(), set()
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            genres = item.get('genre')
+            if isinstance(genres, list):
+                genre_slugs.update(
+                    slug for slug in genres if isinstance(slug, str)
+                )
+            if isinstance(item.get('category'), str):
+                category_slugs.add(item['category'])
+            if 'id' in item:
+                # id приводится так же, как при проверке поля
+                try:
+                    title_ids.add(
+                        serializers.IntegerField().run_validation(item['id'])
+                    )
+                except serializers.ValidationError:
+                    pass
+        return {
+            'genres': genre_lookup.get_many_by_slug(genre_slugs),
+            'categories': category_lookup.get_many_by_slug(category_slugs),
+            'titles': Title.objects.in_bulk(title_ids),
+            'seen_title_ids': set(),
+        }
+
+    def validate_id(self, value):
+        if value not in self.context['titles']:
+            raise serializers.ValidationError('Произведение не найдено.')
+        return value
+
+    def validate_genre(self, value):
+        genres = self.context['genres']
+        missing = [slug for slug in value if slug not in genres]
+        if missing:
+            raise serializers.ValidationError(
+                f'Жанры не найдены: {", ".join(missing)}.'
+            )
+        return [genres[slug] for slug in dict.fromkeys(value)]
+
+    def validate_category(self, value):
+        if value not in self.context['categories']:
+            raise serializers.ValidationError('Категория не найдена.')
+        return self.context['categories'][value]
+
+    def validate(self, attrs):
+        # повторное изменение в одном пакете продублировало бы связи
+        # с жанрами, поэтому сохраняется только первый прошедший проверку
+        # элемент; id запоминается, только когда элемент проверен целиком
+        title_id = attrs.get('id')
+        if title_id is not None:
+            if title_id in self.context['seen_title_ids']:
+                raise serializers.ValidationError({
+                    'id': 'Произведение уже изменяется в этом пакете.'
+                })
+            self.context['seen_title_ids'].add(title_id)
+        return attrs
+
+    @classmethod
+    def save_all(cls, serializers_):
+        """
+        Сохраняет проверенные элементы в одной транзакции.
+
+        Новые произведения и связи с жанрами вставляются через
+        bulk_create, изменения — через bulk_update. Сигналы при этом не
+        отправляются, поэтому поисковый индекс обновляется явно.
+        """
+        created, updated, genres_by_title = [], [], []
+        update_fields = {'search_name', 'updated_at'}
+        for serializer in serializers_:
+            data = dict(serializer.validated_data)
+            genres = data.pop('genre', None)
+            title_id = data.pop('id', None)
+            if title_id is None:
+                title = Title(**data)
+                created.append(title)
+            else:
+                title = serializer.context['titles'][title_id]
+                for field, value in data.items():
+                    setattr(title, field, value)
+                update_fields.update(data)
+                updated.append(title)
+            title.search_name = search.make_search_key(title.name)
+            # bulk_update не заполняет auto_now, а жанры меняются в обход
+            # m2m_changed, поэтому отметка времени ставится здесь
+            title.updated_at = timezone.now()
+            genres_by_title.append((title, genres))
+
+        through = Title.genre.through
+        updated_ids = {title.pk for title in updated}
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Title.objects.bulk_create(created)
+            else:
+                # без RETURNING id новых строк неизвестны, вставляем по одной
+                for title in created:
+                    title.save()
+            if updated:
+                Title.objects.bulk_update(updated, update_fields)
+            through.objects.filter(title_id__in=[
+                title.pk for title, genres in genres_by_title
+                if genres is not None and title.pk in updated_ids
+            ]).delete()
+            through.objects.bulk_create([
+                through(title_id=title.pk, genre_id=genre.pk)
+                for title, genres in genres_by_title if genres
+                for genre in genres
+            ])
+            title_ids = [title.pk for title, _ in genres_by_title]
+            search.index_titles(title_ids)
+            titles_changed.send(
+                sender=Title, title_ids=title_ids, related=True
+            )
+        return [title for title, _ in genres_by_title]
+
+
+class LeaderboardTitleSerializer(TitleSerializer):
+    weighted_rating = serializers.FloatField(read_only=True)
+
+    class Meta(TitleSerializer.Meta):
+        fields = TitleSerializer.Meta.fields + (
+            'review_count', 'weighted_rating'
+        )
+        read_only_fields = fields
+
+
+class LeaderboardParamsSerializer(serializers.Serializer):
+    """Параметры запроса лидерборда."""
+
+    order = serializers.ChoiceField(
+        choices=('rating', 'reviews'), default='rating'
+    )
+    genre = serializers.SlugField(required=False)
+    category = serializers.SlugField(required=False)
+    min_reviews = serializers.IntegerField(min_value=1, default=1)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.LEADERBOARD_MAX_SIZE,
+        default=settings.LEADERBOARD_SIZE
+    )
+
+
+class AutocompleteParamsSerializer(serializers.Serializer):
+    """Параметры запроса автодополнения."""
+
+    q = serializers.CharField(trim_whitespace=True)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.AUTOCOMPLETE_MAX_SIZE,
+        default=settings.AUTOCOMPLETE_SIZE
+    )
+
+
+class ExportParamsSerializer(serializers.Serializer):
+    """Параметры выгрузки отзывов."""
+
+    # не ``format``: этот параметр DRF использует для выбора рендерера
+    output = serializers.ChoiceField(
+        choices=('ndjson', 'csv'), default='ndjson'
+    )
+    since = serializers.DateTimeField(required=False)
+
+
+class UsersSerializer(
+    UniqueConstraintMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     role = serializers.ChoiceField(choices=RoleChoices.choices, read_only=True)
 
     class Meta:
@@ -98,7 +506,9 @@ class UsersSerializer(serializers.ModelSerializer):
             'last_name', 'bio', 'role')
 
 
-class AdminUsersSerializer(serializers.ModelSerializer):
+class AdminUsersSerializer(
+    UniqueConstraintMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = User
@@ -0,0 +1,59 @@
+from api.autocomplete import autocomplete
+from api.cache import (category_lookup, genre_lookup,
+                       invalidate_title_fragments)
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from reviews.models import Category, Genre, Title
+from reviews.signals import titles_changed
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def invalidate_title(sender, instance, **kwargs):
+    invalidate_title_fragments((instance.pk,))
+
+
+@receiver(titles_changed)
+def invalidate_changed_titles(sender, title_ids, **kwargs):
+    invalidate_title_fragments(title_ids)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_lookup_version(sender, using, **kwargs):
+    lookup = genre_lookup if sender is Genre else category_lookup
+    # до фиксации транзакции другие процессы перечитали бы старые данные
+    transaction.on_commit(lookup.bump, using=using)
+
+
+@receiver(post_save, sender=Title)
+def autocomplete_title_saved(sender, using, **kwargs):
+    transaction.on_commit(autocomplete.mark_changed, using=using)
+    # новое произведение или смена категории меняют ранги категорий
+    transaction.on_commit(autocomplete.mark_names_changed, using=using)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+def autocomplete_names_changed(sender, using, **kwargs):
+    transaction.on_commit(autocomplete.mark_names_changed, using=using)
+
+
+@receiver(titles_changed)
+def autocomplete_titles_changed(sender, using=None, related=False,
+                                **kwargs):
+    transaction.on_commit(autocomplete.mark_changed, using=using)
+    # отзывы меняют только рейтинг, жанры и категории не затронуты
+    if related:
+        transaction.on_commit(autocomplete.mark_names_changed, using=using)
+
+
+@receiver(post_delete, sender=Title)
+def autocomplete_title_deleted(sender, using, **kwargs):
+    # удаление не видно по updated_at, индекс перестраивается целиком
+    transaction.on_commit(autocomplete.bump, using=using)
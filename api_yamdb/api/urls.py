@@ -1,4 +1,5 @@
-from api.views import (CategoryViewSet, CommentViewSet, GenreViewSet,
+from api.views import (AutocompleteView, CategoryViewSet, CommentViewSet,
+                       GenreViewSet, LeaderboardView, ReviewExportView,
                        ReviewViewSet, Signup, TitleViewSet, TokenObtain,
                        UsersViewSet)
 from django.urls import include, path
@@ -34,6 +35,11 @@ urlpatterns = [
     path('', include(router.urls)),
     path('auth/signup/', Signup.as_view(), name='signup'),
     path('auth/token/', TokenObtain.as_view(), name='token-obtain'),
+    path('leaderboards/', LeaderboardView.as_view(), name='leaderboards'),
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+    path(
+        'export/reviews/', ReviewExportView.as_view(), name='export-reviews'
+    ),
     path(
         'titles/<int:title_id>/reviews/',
         review_list,
@@ -1,17 +1,28 @@
-from api.filters import TitleFilter
-from api.permissions import (AdminOnly, IsAdminOrReadOnly,
-                             IsAuthorOrModeratorOrAdmin)
-from api.serializers import (AdminUsersSerializer, CategorySerializer,
-                             CommentSerializer, GenreSerializer,
-                             ReviewSerializer, SignUpSerializer,
+from api.autocomplete import autocomplete
+from api.export import EXPORT_OUTPUTS, iter_records
+from api.filters import NameSearchFilter, TitleFilter, TitleSearchFilter
+from api.mixins import (ConditionalGetMixin, ConditionalListMixin,
+                        SparseFieldsQuerysetMixin, TitleFragmentCacheMixin)
+from api.pagination import (FeedPagination, KnownCountPagination,
+                            TitlePagination)
+from api.permissions import (AdminOnly, AdminOrModeratorOnly,
+                             IsAdminOrReadOnly, IsAuthorOrModeratorOrAdmin)
+from api.serializers import (AdminUsersSerializer,
+                             AutocompleteParamsSerializer, CategorySerializer,
+                             CommentSerializer, ExportParamsSerializer,
+                             GenreSerializer, LeaderboardParamsSerializer,
+                             LeaderboardTitleSerializer, ReviewSerializer,
+                             SignUpSerializer, TitleBulkItemSerializer,
                              TitleSerializer, TokenObtainSerializer,
-                             UsersSerializer)
+                             UsersSerializer, get_included_fields)
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import EmailMessage
-from django.db.models import Avg
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import (exceptions, filters, mixins, pagination,
-                            permissions, status, viewsets)
+from rest_framework import (exceptions, generics, mixins, permissions,
+                            status, viewsets)
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.generics import get_object_or_404
@@ -19,12 +30,15 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
-from reviews.models import Category, Genre, Review, Title
+from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.recommendations import factor_store
 
 User = get_user_model()
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(
+    ConditionalGetMixin, SparseFieldsQuerysetMixin, viewsets.ModelViewSet
+):
     """Вьюсет для отзывов на произведения."""
 
     serializer_class = ReviewSerializer
@@ -32,12 +46,53 @@ class ReviewViewSet(viewsets.ModelViewSet):
         permissions.IsAuthenticatedOrReadOnly,
         IsAuthorOrModeratorOrAdmin
     )
+    pagination_class = FeedPagination
+    select_related_fields = ('author',)
+    deferrable_fields = ('text',)
 
     def get_title(self):
-        return get_object_or_404(Title, id=self.kwargs.get('title_id'))
+        # вьюсет создаётся на каждый запрос, поэтому произведение
+        # загружается не больше одного раза за запрос
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(
+                Title, id=self.kwargs.get('title_id')
+            )
+        return self._title
 
     def get_queryset(self):
-        return self.get_title().reviews.all()
+        # произведение не загружается: его наличие проверяется, только
+        # если страница оказалась пустой (см. paginate_queryset)
+        return self.narrow_queryset(
+            Review.objects.filter(title_id=self.kwargs.get('title_id'))
+        )
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if not page:
+            self.get_title()
+        return page
+
+    def attach_comments_preview(self, reviews):
+        """Последние комментарии отзывов для ``?include=comments_preview``."""
+        if 'comments_preview' not in get_included_fields(
+            self.get_serializer_context()
+        ):
+            return
+        previews = {review.pk: [] for review in reviews}
+        for comment in Comment.objects.latest_per_review(
+            previews, settings.COMMENTS_PREVIEW_SIZE
+        ).select_related('author'):
+            previews[comment.review_id].append(comment)
+        for review in reviews:
+            review.comments_preview = previews[review.pk]
+
+    def serialize_page(self, page):
+        self.attach_comments_preview(page)
+        return super().serialize_page(page)
+
+    def serialize_object(self, instance):
+        self.attach_comments_preview([instance])
+        return super().serialize_object(instance)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user, title=self.get_title())
@@ -49,7 +104,9 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return super().update(request, partial=partial, *args, **kwargs)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(
+    ConditionalGetMixin, SparseFieldsQuerysetMixin, viewsets.ModelViewSet
+):
     """Вьюсет для комментариев к отзывам."""
 
     http_method_names = ('get', 'post', 'patch', 'delete')
@@ -58,16 +115,31 @@ class CommentViewSet(viewsets.ModelViewSet):
         permissions.IsAuthenticatedOrReadOnly,
         IsAuthorOrModeratorOrAdmin
     )
+    pagination_class = FeedPagination
+    select_related_fields = ('author',)
+    deferrable_fields = ('text',)
 
     def get_review(self):
-        return get_object_or_404(
-            Review,
-            id=self.kwargs.get('review_id'),
-            title_id=self.kwargs.get('title_id')
-        )
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review,
+                id=self.kwargs.get('review_id'),
+                title_id=self.kwargs.get('title_id')
+            )
+        return self._review
 
     def get_queryset(self):
-        return self.get_review().comments.all()
+        # как в ReviewViewSet: отзыв проверяется только для пустой страницы
+        return self.narrow_queryset(Comment.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review__title_id=self.kwargs.get('title_id')
+        ))
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if not page:
+            self.get_review()
+        return page
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user, review=self.get_review())
@@ -82,40 +154,218 @@ class CreateListDestroyViewSet(
     pass
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(
+    TitleFragmentCacheMixin,
+    SparseFieldsQuerysetMixin,
+    viewsets.ModelViewSet
+):
     serializer_class = TitleSerializer
     http_method_names = ('get', 'post', 'patch', 'delete')
-    pagination_class = pagination.LimitOffsetPagination
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
+    pagination_class = TitlePagination
+    filter_backends = (DjangoFilterBackend, TitleSearchFilter)
     search_fields = ('name', 'genre__slug', 'category__slug')
     filterset_class = TitleFilter
     permission_classes = (IsAdminOrReadOnly,)
+    # жанры и категория берутся из справочников в памяти (api.cache),
+    # из БД нужны только их id
+    prefetch_related_fields = (
+        Prefetch('genre', queryset=Genre.objects.only('pk')),
+    )
+    deferrable_fields = ('description',)
+
+    def get_queryset(self):
+        return self.narrow_queryset(Title.objects.order_by('-year', '-id'))
+
+    @action(detail=False, url_path='facets')
+    def facets(self, request):
+        """Счётчики для фильтров с учётом текущих фильтров и поиска."""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(queryset.facets())
+
+    @action(detail=True, url_path='similar')
+    def similar(self, request, pk=None):
+        """
+        Похожие произведения по оценкам пользователей.
+
+        Соседи рассчитываются офлайн командой build_similar_titles, здесь
+        только читаются; сходство отдаётся в поле ``similarity``.
+        """
+        title = get_object_or_404(Title.objects.only('pk'), pk=pk)
+        neighbours = list(
+            title.similar_titles.select_related('similar')
+            [:settings.SIMILAR_TITLES_TOP_K]
+        )
+        fragments = self.get_fragments(
+            neighbour.similar for neighbour in neighbours
+        )
+        return Response([
+            {**fragment, 'similarity': round(neighbour.score, 4)}
+            for neighbour, fragment in zip(neighbours, fragments)
+        ])
+
+    @action(detail=False, url_path='recommended',
+            permission_classes=(IsAuthenticated,))
+    def recommended(self, request):
+        """
+        Персональные рекомендации по оценкам пользователя.
+
+        Выдача считается по факторам из train_recommendations, без
+        агрегатов в БД. Пока пользователь не попал в обучение, отдаются
+        лучшие по взвешенному рейтингу произведения.
+        """
+        limit = settings.RECOMMENDATIONS_SIZE
+        reviewed = set(request.user.reviews.values_list('title_id', flat=True))
+        factors = factor_store.get(settings.RECOMMENDATION_FACTORS_DIR)
+        ranked = factors and factors.recommend(
+            request.user.pk, reviewed, limit
+        )
+        if ranked is None:
+            titles = list(
+                Title.objects.leaderboard().exclude(pk__in=reviewed)[:limit]
+            )
+            ranked = [(title.pk, None) for title in titles]
+            titles = {title.pk: title for title in titles}
+        else:
+            titles = Title.objects.in_bulk(
+                [title_id for title_id, _ in ranked]
+            )
+        # произведения, удалённые после обучения, пропускаются
+        ranked = [
+            (title_id, score) for title_id, score in ranked
+            if title_id in titles
+        ]
+        fragments = self.get_fragments(
+            titles[title_id] for title_id, _ in ranked
+        )
+        return Response([
+            {
+                **fragment,
+                'predicted_score': (
+                    None if score is None else round(score, 1)
+                ),
+            }
+            for (_, score), fragment in zip(ranked, fragments)
+        ])
+
+    @action(detail=False, methods=('post',), url_path='bulk')
+    def bulk(self, request):
+        """
+        Пакетное создание и изменение произведений.
+
+        Ответ — список в порядке запроса: сохранённое произведение либо
+        ``{"errors": ...}``. Ошибки отдельных элементов не отменяют
+        сохранение остальных.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise exceptions.ValidationError(
+                'Ожидается непустой список произведений.'
+            )
+        if len(items) > settings.TITLE_BULK_MAX_SIZE:
+            raise exceptions.ValidationError(
+                'В одном запросе не больше '
+                f'{settings.TITLE_BULK_MAX_SIZE} произведений.'
+            )
+        context = {
+            **self.get_serializer_context(),
+            **TitleBulkItemSerializer.preload(items),
+        }
+        serializers = [
+            TitleBulkItemSerializer(
+                data=item,
+                context=context,
+                partial=isinstance(item, dict) and 'id' in item
+            )
+            for item in items
+        ]
+        valid = [
+            serializer for serializer in serializers if serializer.is_valid()
+        ]
+        saved_ids = [
+            title.pk for title in TitleBulkItemSerializer.save_all(valid)
+        ]
+        saved = self.get_queryset().in_bulk(saved_ids)
+        saved_titles = iter(saved_ids)
+        results = [
+            {'errors': serializer.errors} if serializer.errors
+            else TitleSerializer(
+                saved[next(saved_titles)], context=context
+            ).data
+            for serializer in serializers
+        ]
+        if not valid:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(valid) < len(serializers):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(results, status=response_status)
+
+
+class AutocompleteView(APIView):
+    """
+    Подсказки по началу названия: произведения, жанры и категории.
+
+    Ответ строится по индексам в памяти процесса (api.autocomplete),
+    произведения упорядочены по числу отзывов.
+    """
+
+    permission_classes = (permissions.AllowAny,)
+
+    def get(self, request):
+        params = AutocompleteParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(autocomplete.search(
+            params.validated_data['q'], params.validated_data['limit']
+        ))
+
+
+class LeaderboardView(generics.ListAPIView):
+    """
+    Лучшие произведения: общий список, по жанру или по категории.
+
+    Взвешенный рейтинг и число отзывов хранятся в произведении и
+    обновляются вместе с отзывами, поэтому список — это чтение по индексу
+    без агрегации отзывов.
+    """
+
+    serializer_class = LeaderboardTitleSerializer
+    permission_classes = (permissions.AllowAny,)
+    pagination_class = None
+    filter_backends = ()
 
     def get_queryset(self):
+        params = LeaderboardParamsSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
         queryset = Title.objects.all()
+        if 'genre' in params:
+            queryset = queryset.filter(genre__slug=params['genre'])
+        if 'category' in params:
+            queryset = queryset.filter(category__slug=params['category'])
         return (
             queryset
-            .order_by('-year')
-            .annotate(rating=Avg('reviews__score'))
+            .leaderboard(params['order'], params['min_reviews'])
+            .select_related('category')
+            .prefetch_related('genre')
+            [:params['limit']]
         )
 
 
-class GenreViewSet(CreateListDestroyViewSet):
+class GenreViewSet(ConditionalListMixin, CreateListDestroyViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
-    pagination_class = pagination.LimitOffsetPagination
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('name',)
+    pagination_class = KnownCountPagination
+    filter_backends = (NameSearchFilter,)
     lookup_field = 'slug'
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class CategoryViewSet(CreateListDestroyViewSet):
+class CategoryViewSet(ConditionalListMixin, CreateListDestroyViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
-    pagination_class = pagination.LimitOffsetPagination
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('name',)
+    pagination_class = KnownCountPagination
+    filter_backends = (NameSearchFilter,)
     lookup_field = 'slug'
     permission_classes = (IsAdminOrReadOnly,)
 
@@ -195,3 +445,39 @@ class Signup(APIView):
         }
         self.send_email(data)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ReviewExportView(APIView):
+    """
+    Потоковая выгрузка всех отзывов для аналитики.
+
+    ``?output=ndjson|csv`` выбирает формат, ``?since=`` ограничивает
+    выгрузку записями, изменёнными с указанного момента,
+    ``?include=comments`` добавляет комментарии (после отзывов).
+    """
+
+    permission_classes = (AdminOrModeratorOnly,)
+
+    def perform_content_negotiation(self, request, force=False):
+        # тело ответа — не JSON, поэтому Accept: text/csv не должен
+        # приводить к 406; рендерер нужен только для ошибок
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        params = ExportParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        output = params.validated_data['output']
+        kinds = ['review']
+        if 'comments' in get_included_fields({'request': request}):
+            kinds.append('comment')
+        render, content_type = EXPORT_OUTPUTS[output]
+        response = StreamingHttpResponse(
+            render(iter_records(
+                kinds, params.validated_data.get('since')
+            )),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="reviews.{output}"'
+        )
+        return response
@@ -1,3 +1,4 @@
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -73,6 +74,36 @@ DATABASES = {
 }
 
 
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # версии справочников в памяти процессов (api.cache.shared_cache):
+    # должны быть видны всем воркерам, поэтому не LocMemCache. Файловый
+    # кэш читает записи через pickle, поэтому каталог принадлежит проекту,
+    # а не лежит под общим /tmp; он общий только для воркеров одной
+    # машины — при нескольких хостах нужен Redis или Memcached
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'SHARED_CACHE_DIR', BASE_DIR / 'shared_cache'
+        ),
+    },
+}
+
+# Время жизни сериализованных произведений в кэше, секунды
+TITLE_FRAGMENT_TIMEOUT = 60 * 60
+
+# Как часто справочники в памяти процесса (api.cache.LookupCache)
+# сверяют свою версию с shared-кэшем, секунды
+LOOKUP_VERSION_CHECK_INTERVAL = 1
+
+# Время жизни приблизительного количества записей (?count=estimate), секунды
+LIST_COUNT_CACHE_TIMEOUT = 60
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -121,8 +152,7 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
-    'DEFAULT_PAGINATION_CLASS':
-        'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KnownCountPagination',
     'PAGE_SIZE': 10,
 }
 
@@ -130,3 +160,36 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+
+# Байесовское сглаживание рейтинга для лидербордов: сколько виртуальных
+# оценок и какого значения добавляется к отзывам каждого произведения
+RATING_PRIOR_MEAN = 5.5
+RATING_PRIOR_WEIGHT = 5
+LEADERBOARD_SIZE = 20
+LEADERBOARD_MAX_SIZE = 100
+
+TITLE_BULK_MAX_SIZE = 1000
+
+AUTOCOMPLETE_SIZE = 10
+AUTOCOMPLETE_MAX_SIZE = 50
+
+# Последние комментарии в ленте отзывов (?include=comments_preview)
+COMMENTS_PREVIEW_SIZE = 2
+
+# Строк за одно чтение из БД при потоковой выгрузке (api.export)
+EXPORT_CHUNK_SIZE = 2000
+
+# Похожие произведения (reviews.recommendations): сколько соседей хранить
+# и сколько общих авторов нужно паре, чтобы её сходству можно было верить
+SIMILAR_TITLES_TOP_K = 20
+SIMILAR_TITLES_MIN_COMMON = 2
+
+# Персональные рекомендации: каталог с факторами (train_recommendations),
+# параметры обучения и размер выдачи; каталог лучше держать вне проекта
+RECOMMENDATION_FACTORS_DIR = os.getenv(
+    'RECOMMENDATION_FACTORS_DIR', BASE_DIR / 'recommendations'
+)
+RECOMMENDATION_RANK = 32
+RECOMMENDATION_ITERATIONS = 10
+RECOMMENDATION_REGULARIZATION = 0.1
+RECOMMENDATIONS_SIZE = 20
@@ -1,11 +1,33 @@
 from django.db import models
 from reviews.constants import NAME_LENGTH, SLUG_LENGTH
+from reviews.search import make_search_key
 
 
-class BaseNameSlugModel(models.Model):
+class SearchNameModel(models.Model):
+    # Абстрактная модель с нормализованным ключом поиска по полю name
+    search_name = models.CharField(
+        'Ключ поиска',
+        max_length=NAME_LENGTH,
+        editable=False,
+        db_index=True
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.search_name = make_search_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_name'}
+        super().save(*args, **kwargs)
+
+
+class BaseNameSlugModel(SearchNameModel):
     # Абстрактная базовая модель с полями name и slug
     name = models.CharField('Название', max_length=NAME_LENGTH)
     slug = models.SlugField('Слаг', max_length=SLUG_LENGTH, unique=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         abstract = True
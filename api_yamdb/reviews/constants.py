@@ -6,3 +6,5 @@ LASTNAME_LENGTH = 150
 EMAIL_LENGTH = 254
 ROLE_LENGTH = 10
 CONFIRMATION_CODE_LENGTH = 255
+MIN_SCORE = 1
+MAX_SCORE = 10
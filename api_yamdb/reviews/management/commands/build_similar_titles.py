@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from reviews.recommendations import REVIEW_CHUNK_SIZE, build_similar_titles
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассчитывает похожие произведения по оценкам пользователей. '
+        'С --incremental пересчитывает только изменённые с прошлого запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Пересчитать только произведения с новыми оценками.'
+        )
+        parser.add_argument(
+            '--top-k', type=int,
+            help='Сколько соседей хранить для произведения.'
+        )
+        parser.add_argument(
+            '--min-common', type=int,
+            help='Минимальное число общих авторов у пары произведений.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=REVIEW_CHUNK_SIZE,
+            help='Сколько отзывов читать из БД за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        processed = build_similar_titles(
+            incremental=options['incremental'],
+            top_k=options['top_k'],
+            min_common=options['min_common'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано произведений: {processed}')
+        )
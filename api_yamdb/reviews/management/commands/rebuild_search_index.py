@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.search import rebuild_search_index, rebuild_search_keys
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает ключи поиска по названиям и перестраивает '
+        'полнотекстовый индекс произведений. '
+        'Нужна после массового импорта в обход моделей.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_search_keys()
+            rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.models import Title
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг и количество отзывов у всех произведений. '
+        'Нужна после массового импорта отзывов в обход моделей.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = Title.objects.rebuild_review_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано произведений: {updated}')
+        )
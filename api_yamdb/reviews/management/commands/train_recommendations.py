@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from reviews.recommendations import REVIEW_CHUNK_SIZE, train_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Обучает факторы персональных рекомендаций по всем отзывам и '
+        'публикует их в RECOMMENDATION_FACTORS_DIR.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rank', type=int, help='Число факторов.')
+        parser.add_argument(
+            '--iterations', type=int, help='Число итераций ALS.'
+        )
+        parser.add_argument(
+            '--regularization', type=float, help='Коэффициент регуляризации.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=REVIEW_CHUNK_SIZE,
+            help='Сколько отзывов читать из БД за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        users, titles = train_recommendations(
+            settings.RECOMMENDATION_FACTORS_DIR,
+            rank=options['rank'],
+            iterations=options['iterations'],
+            regularization=options['regularization'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обучено: пользователей {users}, произведений {titles}'
+        ))
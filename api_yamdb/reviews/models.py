@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from reviews.abstracts import BaseNameSlugModel
-from reviews.constants import NAME_LENGTH
+from django.db import models, transaction
+from django.db.models import (Case, Count, Exists, ExpressionWrapper, F,
+                              OuterRef, Q, Subquery, Sum, When)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+from reviews.abstracts import BaseNameSlugModel, SearchNameModel
+from reviews.constants import MAX_SCORE, MIN_SCORE, NAME_LENGTH
 from reviews.validators import check_year_availability
 from users.models import User
 
@@ -20,7 +26,176 @@ class Genre(BaseNameSlugModel):
         verbose_name_plural = 'Жанры'
 
 
-class Title(models.Model):
+def rating_expressions(rating_sum, review_count):
+    """
+    Выражения для средней и взвешенной оценки по сумме и числу отзывов.
+
+    Взвешенная оценка — байесовское среднее: к отзывам добавляется
+    RATING_PRIOR_WEIGHT виртуальных оценок RATING_PRIOR_MEAN, поэтому
+    одна десятка не поднимает произведение на вершину лидерборда.
+    """
+    prior_weight = settings.RATING_PRIOR_WEIGHT
+    prior_total = settings.RATING_PRIOR_MEAN * prior_weight
+    return {
+        'rating': ExpressionWrapper(
+            Cast(rating_sum, models.FloatField()) / NullIf(review_count, 0),
+            output_field=models.FloatField()
+        ),
+        'weighted_rating': ExpressionWrapper(
+            (Cast(rating_sum, models.FloatField()) + prior_total)
+            / NullIf(review_count + prior_weight, 0),
+            output_field=models.FloatField()
+        ),
+    }
+
+
+class TitleQuerySet(models.QuerySet):
+    """Запросы к произведениям с поддержкой агрегатов по отзывам."""
+
+    def apply_review_score(self, added=None, removed=None):
+        """
+        Атомарно учитывает добавленную и/или снятую оценку отзыва.
+
+        ``removed`` — запрос к строке отзыва: снимаемая оценка читается из
+        БД в том же UPDATE. Если строки уже нет (отзыв удалён или изменён
+        другим запросом), произведения не меняются и возвращается 0.
+        """
+        titles = self
+        rating_sum = F('rating_sum') + (added or 0)
+        review_count = F('review_count') + int(added is not None)
+        histogram = {}
+        if added is not None:
+            histogram[f'score_{added}'] = F(f'score_{added}') + 1
+        if removed is not None:
+            removed = removed.order_by()
+            titles = titles.filter(Exists(removed))
+            rating_sum = rating_sum - Subquery(removed.values('score')[:1])
+            review_count = review_count - 1
+            for score in range(MIN_SCORE, MAX_SCORE + 1):
+                name = f'score_{score}'
+                histogram[name] = histogram.get(name, F(name)) - Case(
+                    When(Exists(removed.filter(score=score)), then=1),
+                    default=0,
+                    output_field=models.IntegerField()
+                )
+        return titles.update(
+            rating_sum=rating_sum,
+            review_count=review_count,
+            **rating_expressions(rating_sum, review_count),
+            **histogram,
+            updated_at=timezone.now(),
+        )
+
+    def touch(self):
+        """Отмечает изменение представления произведений для кэшей."""
+        return self.update(updated_at=timezone.now())
+
+    def facets(self):
+        """
+        Количество произведений по жанрам, категориям и десятилетиям.
+
+        Категории и десятилетия считаются одной группировкой, жанры —
+        второй, по таблице связей; общий итог складывается из первой.
+        """
+        title_ids = self.order_by().values('pk')
+        decade = ExpressionWrapper(
+            F('year') / 10 * 10, output_field=models.IntegerField()
+        )
+        groups = (
+            Title.objects
+            .filter(pk__in=title_ids)
+            .order_by()
+            .values('category__slug', 'category__name')
+            .annotate(decade=decade, count=Count('pk'))
+            .values_list('category__slug', 'category__name', 'decade', 'count')
+        )
+        total = 0
+        categories = {}
+        decades = {}
+        for slug, name, decade_start, count in groups:
+            total += count
+            decades[decade_start] = decades.get(decade_start, 0) + count
+            if slug is not None:
+                category = categories.setdefault(
+                    slug, {'slug': slug, 'name': name, 'count': 0}
+                )
+                category['count'] += count
+        genres = (
+            Title.genre.through.objects
+            .filter(title__in=title_ids)
+            .values('genre__slug', 'genre__name')
+            .annotate(count=Count('title'))
+            .order_by('-count', 'genre__name')
+        )
+        return {
+            'count': total,
+            'genre': [
+                {
+                    'slug': genre['genre__slug'],
+                    'name': genre['genre__name'],
+                    'count': genre['count'],
+                }
+                for genre in genres
+            ],
+            'category': sorted(
+                categories.values(),
+                key=lambda category: (-category['count'], category['name'])
+            ),
+            'decade': [
+                {'decade': decade_start, 'count': count}
+                for decade_start, count in sorted(decades.items())
+            ],
+        }
+
+    def rebuild_review_stats(self):
+        """
+        Пересчитывает агрегаты по отзывам с нуля.
+
+        Сначала сумма, число и гистограмма оценок, затем по ним средние.
+        """
+        reviews = (
+            Review.objects
+            .filter(title=OuterRef('pk'))
+            .order_by()
+            .values('title')
+        )
+        updated = self.update(
+            rating_sum=Coalesce(
+                Subquery(reviews.annotate(total=Sum('score')).values('total')),
+                0
+            ),
+            review_count=Coalesce(
+                Subquery(reviews.annotate(total=Count('id')).values('total')),
+                0
+            ),
+            **{
+                f'score_{score}': Coalesce(
+                    Subquery(
+                        reviews
+                        .annotate(total=Count('id', filter=Q(score=score)))
+                        .values('total')
+                    ),
+                    0
+                )
+                for score in range(MIN_SCORE, MAX_SCORE + 1)
+            },
+        )
+        self.update(
+            **rating_expressions(F('rating_sum'), F('review_count')),
+            updated_at=timezone.now(),
+        )
+        return updated
+
+    def leaderboard(self, order='rating', min_reviews=1):
+        """Произведения в порядке места в лидерборде."""
+        ordering = {
+            'rating': ('-weighted_rating', '-review_count', '-id'),
+            'reviews': ('-review_count', '-weighted_rating', '-id'),
+        }[order]
+        return self.filter(review_count__gte=min_reviews).order_by(*ordering)
+
+
+class Title(SearchNameModel):
     # Модель для хранения информации о произведении
     name = models.CharField('Название', max_length=NAME_LENGTH)
     year = models.SmallIntegerField(
@@ -36,14 +211,111 @@ class Title(models.Model):
         verbose_name='Категория',
     )
     genre = models.ManyToManyField(Genre, verbose_name='Жанр')
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    # Агрегаты по отзывам, поддерживаются сигналами reviews.signals
+    rating_sum = models.PositiveIntegerField('Сумма оценок', default=0)
+    review_count = models.PositiveIntegerField('Количество отзывов', default=0)
+    rating = models.FloatField('Рейтинг', null=True, blank=True)
+    weighted_rating = models.FloatField(
+        'Взвешенный рейтинг', null=True, blank=True
+    )
+    # Распределение оценок: сколько отзывов с каждой оценкой
+    score_1 = models.PositiveIntegerField('Оценок 1', default=0)
+    score_2 = models.PositiveIntegerField('Оценок 2', default=0)
+    score_3 = models.PositiveIntegerField('Оценок 3', default=0)
+    score_4 = models.PositiveIntegerField('Оценок 4', default=0)
+    score_5 = models.PositiveIntegerField('Оценок 5', default=0)
+    score_6 = models.PositiveIntegerField('Оценок 6', default=0)
+    score_7 = models.PositiveIntegerField('Оценок 7', default=0)
+    score_8 = models.PositiveIntegerField('Оценок 8', default=0)
+    score_9 = models.PositiveIntegerField('Оценок 9', default=0)
+    score_10 = models.PositiveIntegerField('Оценок 10', default=0)
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Произведение'
         verbose_name_plural = 'Произведения'
+        indexes = (
+            # порядок выдачи и ключ курсорной пагинации
+            models.Index(fields=('-year', '-id'), name='title_year_id_idx'),
+            # лидерборды: общий и по категории
+            models.Index(
+                fields=('-weighted_rating', '-review_count', '-id'),
+                name='title_top_rated_idx'
+            ),
+            models.Index(
+                fields=('-review_count', '-weighted_rating', '-id'),
+                name='title_most_reviewed_idx'
+            ),
+            models.Index(
+                fields=('category', '-weighted_rating'),
+                name='title_category_top_rated_idx'
+            ),
+            # диапазоны в TitleFilter
+            models.Index(fields=('rating',), name='title_rating_idx'),
+            models.Index(
+                fields=('category', '-year', '-id'),
+                name='title_category_year_idx'
+            ),
+            # догрузка изменённых произведений в автодополнение
+            models.Index(fields=('updated_at',), name='title_updated_at_idx'),
+        )
 
     def __str__(self) -> str:
         return self.name
 
+    @property
+    def score_histogram(self):
+        """Количество отзывов по оценкам от минимальной до максимальной."""
+        return [
+            getattr(self, f'score_{score}')
+            for score in range(MIN_SCORE, MAX_SCORE + 1)
+        ]
+
+
+class SimilarTitle(models.Model):
+    """
+    Похожее произведение по оценкам пользователей.
+
+    Заполняется командой build_similar_titles (reviews.recommendations):
+    для каждого произведения хранятся ближайшие соседи с мерой сходства.
+    """
+
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='similar_titles',
+        verbose_name='Произведение'
+    )
+    similar = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожее произведение'
+    )
+    score = models.FloatField('Сходство')
+    computed_at = models.DateTimeField('Дата расчёта', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Похожее произведение'
+        verbose_name_plural = 'Похожие произведения'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('title', 'similar'),
+                name='unique_similar_title'
+            )
+        ]
+        indexes = (
+            models.Index(
+                fields=('title', '-score'), name='similar_title_score_idx'
+            ),
+        )
+        ordering = ('-score',)
+
+    def __str__(self):
+        return f'{self.title_id} → {self.similar_id}: {self.score:.3f}'
+
 
 class Review(models.Model):
     # модель отзыва на произведение
@@ -67,13 +339,22 @@ class Review(models.Model):
     )
     # оценка от 1 до 10
     score = models.PositiveSmallIntegerField(
-        validators=[MinValueValidator(1), MaxValueValidator(10)],
+        validators=[
+            MinValueValidator(MIN_SCORE), MaxValueValidator(MAX_SCORE)
+        ],
         verbose_name='Оценка'
     )
     # дата публикации
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Дата изменения'
+    )
+    # поддерживается сигналами reviews.signals
+    comment_count = models.PositiveIntegerField(
+        default=0, verbose_name='Количество комментариев'
+    )
 
     class Meta:
         # один пользователь оставляет один отзыв
@@ -85,12 +366,51 @@ class Review(models.Model):
                 name='unique_review'
             )
         ]
+        indexes = (
+            # лента отзывов произведения без сортировки во временном дереве
+            models.Index(
+                fields=('title', '-pub_date', '-id'), name='review_feed_idx'
+            ),
+            # выгрузка изменённых отзывов (?since=)
+            models.Index(
+                fields=('updated_at',), name='review_updated_at_idx'
+            ),
+        )
         # сначала новые
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
 
     def __str__(self):
         return f'Отзыв {self.author} на {self.title}'
 
+    def save(self, *args, **kwargs):
+        # отзыв и агрегаты произведения сохраняются в одной транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class CommentQuerySet(models.QuerySet):
+    """Запросы к комментариям."""
+
+    def latest_per_review(self, review_ids, size):
+        """
+        Последние ``size`` комментариев каждого из отзывов одним запросом.
+
+        Номер комментария внутри отзыва считает оконная функция, поэтому
+        число запросов не зависит от количества отзывов.
+        """
+        review_ids = list(review_ids)
+        if not review_ids:
+            return self.none()
+        table = self.model._meta.db_table
+        placeholders = ', '.join(['%s'] * len(review_ids))
+        return self.filter(pk__in=RawSQL(
+            f'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+            f'PARTITION BY review_id ORDER BY pub_date DESC, id DESC'
+            f') AS position FROM {table} '
+            f'WHERE review_id IN ({placeholders})) WHERE position <= %s',
+            (*review_ids, size)
+        )).order_by('review_id', '-pub_date', '-id')
+
 
 class Comment(models.Model):
     # привязка комента к отзыву
@@ -111,11 +431,31 @@ class Comment(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
-        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('review', '-pub_date', '-id'),
+                name='comment_feed_idx'
+            ),
+            models.Index(
+                fields=('updated_at',), name='comment_updated_at_idx'
+            ),
+        )
+        ordering = ('-pub_date', '-id')
 
     def __str__(self):
         return f'{self.author}: {self.text[:30]}'
+
+    def save(self, *args, **kwargs):
+        # комментарий и счётчик отзыва сохраняются в одной транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
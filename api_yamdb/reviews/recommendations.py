@@ -0,0 +1,450 @@
+"""
+Рекомендации по оценкам пользователей.
+
+Расчёты выполняются офлайн (команды управления) над матрицей
+«пользователь × произведение» в разреженном виде: отзыв — элемент
+массивов NumPy. Отзывы читаются из БД порциями через values_list,
+без создания экземпляров моделей.
+
+Похожие произведения хранятся в модели SimilarTitle, факторы
+персональных рекомендаций — в файлах .npy, которые рабочие процессы
+отображают в память (см. ``FactorStore``).
+"""
+import os
+
+import numpy as np
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max
+from django.utils import timezone
+from reviews.constants import MAX_SCORE, MIN_SCORE
+
+REVIEW_CHUNK_SIZE = 50000
+# сколько пар «отзыв на произведение — другой отзыв того же автора»
+# разворачивается за раз; ограничивает память одного блока расчёта
+MAX_PAIRS_PER_BATCH = 5_000_000
+WRITE_BATCH_SIZE = 1000
+# сколько отзывов участвует в одном блоке решения ALS
+FACTOR_BLOCK_SIZE = 5000
+FACTORS_LINK = 'current'
+FACTOR_FILES = ('user_ids', 'user_factors', 'title_ids', 'title_factors')
+
+
+class ReviewMatrix:
+    """
+    Оценки в разреженном виде (координатный формат).
+
+    ``users`` и ``titles`` — исходные id по порядковому номеру,
+    ``user_index``, ``title_index`` и ``scores`` — по элементу на отзыв.
+    """
+
+    def __init__(self, users, titles, user_index, title_index, scores):
+        self.users = users
+        self.titles = titles
+        self.user_index = user_index
+        self.title_index = title_index
+        self.scores = scores
+
+    @property
+    def shape(self):
+        return len(self.users), len(self.titles)
+
+
+def load_reviews(using=DEFAULT_DB_ALIAS, chunk_size=REVIEW_CHUNK_SIZE):
+    """Читает все оценки порциями по первичному ключу."""
+    from reviews.models import Review
+
+    chunks, last_pk = [], 0
+    while True:
+        rows = list(
+            Review.objects
+            .using(using)
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'author_id', 'title_id', 'score')
+            [:chunk_size]
+        )
+        if not rows:
+            break
+        chunk = np.array(rows, dtype=np.int64)
+        last_pk = int(chunk[-1, 0])
+        chunks.append(chunk[:, 1:].copy())
+    data = (
+        np.concatenate(chunks) if chunks else np.empty((0, 3), np.int64)
+    )
+    users, user_index = np.unique(data[:, 0], return_inverse=True)
+    titles, title_index = np.unique(data[:, 1], return_inverse=True)
+    return ReviewMatrix(
+        users, titles, user_index, title_index,
+        data[:, 2].astype(np.float64)
+    )
+
+
+def _ranges(starts, lengths):
+    """Склеенные диапазоны range(start, start + length) без цикла."""
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + np.arange(total) - offsets
+
+
+def _group(index, size):
+    """Номера элементов, сгруппированные по ``index``, и границы групп."""
+    order = np.argsort(index, kind='stable')
+    pointers = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(index, minlength=size), out=pointers[1:])
+    return order, pointers
+
+
+def item_vectors(matrix):
+    """
+    Векторы произведений для скорректированного косинуса.
+
+    Из оценки вычитается средняя оценка автора (одни ставят всем
+    девятки, другие — шестёрки), затем столбец нормируется.
+    """
+    n_users, n_titles = matrix.shape
+    counts = np.bincount(matrix.user_index, minlength=n_users)
+    sums = np.bincount(
+        matrix.user_index, weights=matrix.scores, minlength=n_users
+    )
+    values = matrix.scores - (sums / np.maximum(counts, 1))[
+        matrix.user_index
+    ]
+    norms = np.sqrt(np.bincount(
+        matrix.title_index, weights=values ** 2, minlength=n_titles
+    ))[matrix.title_index]
+    return np.divide(
+        values, norms, out=np.zeros_like(values), where=norms > 0
+    )
+
+
+def similar_titles(matrix, targets, top_k, min_common):
+    """
+    Ближайшие соседи для произведений с номерами ``targets``.
+
+    Сходство — сумма произведений координат по общим авторам, то есть
+    косинус между векторами ``item_vectors``. Пары с числом общих
+    авторов меньше ``min_common`` и с неположительным сходством
+    отбрасываются. Порождает тройки массивов (номер произведения,
+    номер соседа, сходство) блоками ограниченного размера.
+    """
+    n_users, n_titles = matrix.shape
+    values = item_vectors(matrix)
+    by_user, user_pointers = _group(matrix.user_index, n_users)
+    by_title, title_pointers = _group(matrix.title_index, n_titles)
+    user_lengths = np.diff(user_pointers)
+    # стоимость произведения — число пар, которые придётся развернуть
+    cost = np.bincount(
+        matrix.title_index,
+        weights=user_lengths[matrix.user_index],
+        minlength=n_titles
+    )
+    targets = np.asarray(targets, dtype=np.int64)
+    if not len(targets):
+        return
+    cumulative = np.cumsum(cost[targets])
+    bounds = np.flatnonzero(np.diff(cumulative // MAX_PAIRS_PER_BATCH)) + 1
+    for batch in np.split(targets, bounds):
+        # отзывы на произведения блока
+        lengths = np.diff(title_pointers)[batch]
+        entries = by_title[_ranges(title_pointers[batch], lengths)]
+        entry_targets = np.repeat(np.arange(len(batch)), lengths)
+        # все отзывы тех же авторов
+        authors = matrix.user_index[entries]
+        pair_lengths = user_lengths[authors]
+        others = by_user[_ranges(user_pointers[authors], pair_lengths)]
+        pair_entries = np.repeat(np.arange(len(entries)), pair_lengths)
+        pair_targets = entry_targets[pair_entries]
+        neighbours = matrix.title_index[others]
+        products = values[entries][pair_entries] * values[others]
+
+        distinct = neighbours != batch[pair_targets]
+        keys, inverse = np.unique(
+            pair_targets[distinct] * n_titles + neighbours[distinct],
+            return_inverse=True
+        )
+        scores = np.bincount(inverse, weights=products[distinct])
+        common = np.bincount(inverse)
+        kept = (common >= min_common) & (scores > 0)
+        keys, scores = keys[kept], scores[kept]
+        local_targets, neighbours = np.divmod(keys, n_titles)
+
+        # top-K внутри каждого произведения
+        order = np.lexsort((-scores, local_targets))
+        local_targets = local_targets[order]
+        neighbours, scores = neighbours[order], scores[order]
+        rank = np.arange(len(order)) - np.searchsorted(
+            local_targets, local_targets
+        )
+        top = rank < top_k
+        yield batch[local_targets[top]], neighbours[top], scores[top]
+
+
+def changed_title_ids(since, using=DEFAULT_DB_ALIAS):
+    """
+    Произведения, соседей которых нужно пересчитать после ``since``.
+
+    Это изменённые произведения (новые и удалённые отзывы обновляют
+    ``Title.updated_at``) и те, у кого изменённое числится в соседях.
+    """
+    from reviews.models import SimilarTitle, Title
+
+    changed = set(
+        Title.objects.using(using)
+        .filter(updated_at__gte=since)
+        .values_list('pk', flat=True)
+    )
+    changed.update(
+        SimilarTitle.objects.using(using)
+        .filter(similar__updated_at__gte=since)
+        .values_list('title_id', flat=True)
+    )
+    return changed
+
+
+def build_similar_titles(using=DEFAULT_DB_ALIAS, incremental=False,
+                         top_k=None, min_common=None,
+                         chunk_size=REVIEW_CHUNK_SIZE):
+    """
+    Пересчитывает похожие произведения и возвращает число обработанных.
+
+    При ``incremental`` пересчитываются только произведения, изменённые
+    после прошлого расчёта (см. ``changed_title_ids``); матрица оценок
+    всё равно читается целиком, так как сходство зависит от всех отзывов.
+    """
+    from reviews.models import SimilarTitle
+
+    top_k = top_k or settings.SIMILAR_TITLES_TOP_K
+    min_common = min_common or settings.SIMILAR_TITLES_MIN_COMMON
+    started = timezone.now()
+    rows = SimilarTitle.objects.using(using)
+
+    title_ids = None
+    if incremental:
+        last_built = rows.aggregate(last=Max('computed_at'))['last']
+        if last_built is not None:
+            title_ids = sorted(changed_title_ids(last_built, using))
+            if not title_ids:
+                return 0
+
+    matrix = load_reviews(using, chunk_size)
+    if title_ids is None:
+        targets = np.arange(len(matrix.titles))
+    else:
+        targets = np.flatnonzero(np.isin(matrix.titles, title_ids))
+
+    with transaction.atomic(using=using):
+        if title_ids is None:
+            rows.all().delete()
+        else:
+            for start in range(0, len(title_ids), WRITE_BATCH_SIZE):
+                rows.filter(
+                    title_id__in=title_ids[start:start + WRITE_BATCH_SIZE]
+                ).delete()
+        for titles, neighbours, scores in similar_titles(
+            matrix, targets, top_k, min_common
+        ):
+            rows.bulk_create(
+                (
+                    SimilarTitle(
+                        title_id=title_id, similar_id=similar_id,
+                        score=score, computed_at=started
+                    )
+                    for title_id, similar_id, score in zip(
+                        matrix.titles[titles].tolist(),
+                        matrix.titles[neighbours].tolist(),
+                        scores.tolist()
+                    )
+                ),
+                batch_size=WRITE_BATCH_SIZE
+            )
+    return len(targets) if title_ids is None else len(title_ids)
+
+
+def _row_blocks(pointers, limit):
+    """Границы блоков строк, в каждом не больше ``limit`` отзывов."""
+    start, rows = 0, len(pointers) - 1
+    while start < rows:
+        stop = int(np.searchsorted(
+            pointers, pointers[start] + limit, side='right'
+        )) - 1
+        stop = min(max(stop, start + 1), rows)
+        yield start, stop
+        start = stop
+
+
+def _solve_rows(group, other_index, other_factors, residuals,
+                regularization):
+    """
+    Шаг ALS: факторы строк при фиксированных факторах другой стороны.
+
+    Для каждой строки решается гребневая регрессия по её отзывам;
+    системы блока собираются через reduceat и решаются одним вызовом.
+    """
+    order, pointers = group
+    rank = other_factors.shape[1]
+    identity = np.eye(rank)
+    result = np.empty((len(pointers) - 1, rank))
+    for start, stop in _row_blocks(pointers, FACTOR_BLOCK_SIZE):
+        entries = order[pointers[start]:pointers[stop]]
+        factors = other_factors[other_index[entries]]
+        weighted = factors * residuals[entries][:, None]
+        if stop - start == 1:
+            # одна строка с очень большим числом отзывов
+            gram = (factors.T @ factors)[None]
+            rhs = weighted.sum(axis=0)[None]
+        else:
+            bounds = pointers[start:stop] - pointers[start]
+            gram = np.add.reduceat(
+                factors[:, :, None] * factors[:, None, :], bounds
+            )
+            rhs = np.add.reduceat(weighted, bounds)
+        counts = np.diff(pointers[start:stop + 1])
+        gram += regularization * counts[:, None, None] * identity
+        result[start:stop] = np.linalg.solve(gram, rhs[..., None])[..., 0]
+    return result
+
+
+def train_factors(matrix, rank, iterations, regularization, seed=0):
+    """
+    Низкоранговое разложение оценок методом ALS.
+
+    Оценка приближается как ``mean + user · title``. Возвращает среднюю
+    оценку и матрицы факторов пользователей и произведений (float32).
+    """
+    n_users, n_titles = matrix.shape
+    mean = float(matrix.scores.mean()) if len(matrix.scores) else 0.0
+    residuals = matrix.scores - mean
+    random = np.random.default_rng(seed)
+    users = random.normal(scale=0.1, size=(n_users, rank))
+    titles = random.normal(scale=0.1, size=(n_titles, rank))
+    by_user = _group(matrix.user_index, n_users)
+    by_title = _group(matrix.title_index, n_titles)
+    for _ in range(iterations):
+        users = _solve_rows(
+            by_user, matrix.title_index, titles, residuals, regularization
+        )
+        titles = _solve_rows(
+            by_title, matrix.user_index, users, residuals, regularization
+        )
+    return mean, users.astype(np.float32), titles.astype(np.float32)
+
+
+def save_factors(directory, matrix, mean, user_factors, title_factors):
+    """
+    Записывает факторы в новый каталог и переключает на него ссылку.
+
+    Ссылка ``current`` заменяется атомарно, поэтому процессы никогда не
+    видят наполовину записанные файлы. Предыдущая версия остаётся, пока
+    её могут держать отображённой в память процессы.
+    """
+    os.makedirs(directory, exist_ok=True)
+    version = timezone.now().strftime('%Y%m%d%H%M%S%f')
+    path = os.path.join(directory, version)
+    os.makedirs(path)
+    arrays = dict(zip(FACTOR_FILES, (
+        matrix.users, user_factors, matrix.titles, title_factors
+    )))
+    arrays['mean'] = np.array(mean)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), array)
+
+    link = os.path.join(directory, FACTORS_LINK)
+    temporary = f'{link}.{version}'
+    os.symlink(version, temporary)
+    os.replace(temporary, link)
+
+    versions = sorted(
+        name for name in os.listdir(directory)
+        if name != FACTORS_LINK and os.path.isdir(
+            os.path.join(directory, name)
+        )
+    )
+    for name in versions[:-2]:
+        old = os.path.join(directory, name)
+        for filename in os.listdir(old):
+            os.remove(os.path.join(old, filename))
+        os.rmdir(old)
+    return path
+
+
+def train_recommendations(directory, using=DEFAULT_DB_ALIAS, rank=None,
+                          iterations=None, regularization=None,
+                          chunk_size=REVIEW_CHUNK_SIZE):
+    """Обучает факторы по всем отзывам и публикует их для API."""
+    matrix = load_reviews(using, chunk_size)
+    mean, user_factors, title_factors = train_factors(
+        matrix,
+        rank or settings.RECOMMENDATION_RANK,
+        iterations or settings.RECOMMENDATION_ITERATIONS,
+        regularization or settings.RECOMMENDATION_REGULARIZATION,
+    )
+    save_factors(directory, matrix, mean, user_factors, title_factors)
+    return matrix.shape
+
+
+class Factors:
+    """Факторы одной версии, отображённые в память только для чтения."""
+
+    def __init__(self, path):
+        for name in FACTOR_FILES:
+            setattr(self, name, np.load(
+                os.path.join(path, f'{name}.npy'), mmap_mode='r'
+            ))
+        self.mean = float(np.load(os.path.join(path, 'mean.npy')))
+
+    def recommend(self, user_id, exclude_title_ids=(), limit=20):
+        """
+        Лучшие ``limit`` произведений для пользователя.
+
+        Одно умножение матрицы факторов произведений на вектор
+        пользователя и частичная сортировка. Возвращает пары
+        (id произведения, ожидаемая оценка) или None, если пользователя
+        не было в обучающих данных.
+        """
+        position = int(np.searchsorted(self.user_ids, user_id))
+        if (
+            position == len(self.user_ids)
+            or self.user_ids[position] != user_id
+        ):
+            return None
+        scores = self.title_factors @ self.user_factors[position]
+        excluded = np.flatnonzero(
+            np.isin(self.title_ids, list(exclude_title_ids))
+        )
+        scores[excluded] = -np.inf
+        limit = min(limit, len(scores) - len(excluded))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        predicted = np.clip(scores[top] + self.mean, MIN_SCORE, MAX_SCORE)
+        return list(zip(
+            self.title_ids[top].tolist(), predicted.tolist()
+        ))
+
+
+class FactorStore:
+    """
+    Текущие факторы процесса.
+
+    Файлы отображаются в память (mmap), поэтому страницы с данными
+    общие для всех рабочих процессов. Новая версия подхватывается, как
+    только ссылка ``current`` начинает указывать на другой каталог.
+    """
+
+    def __init__(self):
+        self._loaded = (None, None)
+
+    def get(self, directory):
+        path = os.path.realpath(os.path.join(directory, FACTORS_LINK))
+        if not os.path.isdir(path):
+            return None
+        if self._loaded[0] != path:
+            self._loaded = (path, Factors(path))
+        return self._loaded[1]
+
+
+factor_store = FactorStore()
@@ -0,0 +1,197 @@
+"""Поиск по названиям: ключи для индексного поиска и индекс FTS5."""
+import unicodedata
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+TITLE_SEARCH_TABLE = 'reviews_title_fts'
+TITLE_SEARCH_COLUMNS = ('name', 'description', 'genres', 'category')
+# триграммный токенизатор ищет подстроки (SQLite 3.34+); слова короче
+# триграммы он не находит, для них остаётся LIKE по тем же колонкам
+TITLE_SEARCH_TOKENIZER = 'trigram'
+TRIGRAM_LENGTH = 3
+INDEX_BATCH_SIZE = 500
+
+
+def make_search_key(value):
+    """
+    Нормализует строку для сравнения без учёта регистра.
+
+    SQLite приводит к нижнему регистру только ASCII, поэтому ключ
+    считается в Python: casefold, «ё» как «е», схлопнутые пробелы.
+    """
+    value = unicodedata.normalize('NFKC', value or '').casefold()
+    return ' '.join(value.replace('ё', 'е').split())
+
+
+def search_available(using=DEFAULT_DB_ALIAS):
+    """Индекс ведётся только в SQLite, остальные СУБД ищут через LIKE."""
+    return connections[using].vendor == 'sqlite'
+
+
+def create_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Создаёт таблицу индекса и заполняет её, если она только появилась.
+
+    Индекс с другим токенизатором (прежний unicode61) пересоздаётся.
+    """
+    if not search_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s",
+            (TITLE_SEARCH_TABLE,)
+        )
+        row = cursor.fetchone()
+        if row and f"tokenize = '{TITLE_SEARCH_TOKENIZER}'" in row[0]:
+            return
+        if row:
+            cursor.execute(f'DROP TABLE {TITLE_SEARCH_TABLE}')
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE {TITLE_SEARCH_TABLE} USING fts5('
+            f'{", ".join(TITLE_SEARCH_COLUMNS)}, '
+            f"tokenize = '{TITLE_SEARCH_TOKENIZER}')"
+        )
+    rebuild_search_index(using)
+
+
+def rebuild_search_keys(using=DEFAULT_DB_ALIAS):
+    """Пересчитывает ключи поиска у записей, сохранённых в обход save()."""
+    from reviews.models import Category, Genre, Title
+
+    for model in (Category, Genre, Title):
+        changed = []
+        for instance in model.objects.using(using).only('name', 'search_name'):
+            search_name = make_search_key(instance.name)
+            if instance.search_name != search_name:
+                instance.search_name = search_name
+                changed.append(instance)
+        model.objects.using(using).bulk_update(
+            changed, ('search_name',), batch_size=INDEX_BATCH_SIZE
+        )
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS):
+    """Полностью перестраивает индекс, например после импорта данных."""
+    from reviews.models import Title
+
+    if not search_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TITLE_SEARCH_TABLE}')
+    index_titles(
+        Title.objects.using(using).values_list('pk', flat=True), using
+    )
+
+
+def index_titles(title_ids, using=DEFAULT_DB_ALIAS):
+    """Переиндексирует произведения с указанными id."""
+    title_ids = list(title_ids)
+    if not search_available(using):
+        return
+    for start in range(0, len(title_ids), INDEX_BATCH_SIZE):
+        _index_batch(title_ids[start:start + INDEX_BATCH_SIZE], using)
+
+
+def _index_batch(title_ids, using):
+    from reviews.models import Title
+
+    titles = (
+        Title.objects
+        .using(using)
+        .filter(pk__in=title_ids)
+        .select_related('category')
+        .prefetch_related('genre')
+    )
+    # текст индексируется в виде ключа поиска, как и слова запроса
+    rows = [
+        (
+            title.pk,
+            make_search_key(title.name),
+            make_search_key(title.description),
+            make_search_key(' '.join(
+                f'{genre.name} {genre.slug}' for genre in title.genre.all()
+            )),
+            make_search_key(
+                f'{title.category.name} {title.category.slug}'
+                if title.category else ''
+            ),
+        )
+        for title in titles
+    ]
+    remove_titles(title_ids, using)
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {TITLE_SEARCH_TABLE} '
+            f'(rowid, {", ".join(TITLE_SEARCH_COLUMNS)}) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            rows
+        )
+
+
+def remove_titles(title_ids, using=DEFAULT_DB_ALIAS):
+    title_ids = list(title_ids)
+    if not title_ids or not search_available(using):
+        return
+    placeholders = ', '.join(['%s'] * len(title_ids))
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TITLE_SEARCH_TABLE} '
+            f'WHERE rowid IN ({placeholders})',
+            title_ids
+        )
+
+
+def get_search_keys(search_terms):
+    """Слова запроса, приведённые к ключу поиска."""
+    return [
+        key for term in search_terms
+        for key in make_search_key(term).split()
+    ]
+
+
+def build_match_query(search_terms):
+    """
+    Превращает слова запроса в выражение MATCH.
+
+    Каждое слово ищется как подстрока, все слова должны встретиться
+    в произведении — так же, как их объединяет SearchFilter. Слова
+    короче триграммы в выражение не попадают (см. ``build_search_query``),
+    если других нет, возвращается None.
+    """
+    terms = [
+        term for term in get_search_keys(search_terms)
+        if len(term) >= TRIGRAM_LENGTH
+    ]
+    if not terms:
+        return None
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def build_search_query(search_terms):
+    """
+    Запрос rowid подходящих произведений и его параметры.
+
+    Длинные слова ищутся через MATCH, короткие — через LIKE по колонкам
+    индекса; условия объединяются через AND.
+    """
+    conditions, params = [], []
+    match = build_match_query(search_terms)
+    if match is not None:
+        conditions.append(f'{TITLE_SEARCH_TABLE} MATCH %s')
+        params.append(match)
+    for term in get_search_keys(search_terms):
+        if len(term) >= TRIGRAM_LENGTH:
+            continue
+        pattern = '%{}%'.format(
+            term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        )
+        conditions.append('({})'.format(' OR '.join(
+            f"{column} LIKE %s ESCAPE '\\'"
+            for column in TITLE_SEARCH_COLUMNS
+        )))
+        params.extend([pattern] * len(TITLE_SEARCH_COLUMNS))
+    return (
+        f'SELECT rowid FROM {TITLE_SEARCH_TABLE} '
+        f'WHERE {" AND ".join(conditions)}',
+        params
+    )
@@ -0,0 +1,148 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.db.models import Exists, F
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from reviews import search
+from reviews.models import Category, Comment, Genre, Review, Title
+
+# Представление произведений изменилось без сохранения самих Title:
+# пересчитан рейтинг, изменены жанры или категория. Аргументы: title_ids;
+# related=True, если изменились жанры или категории произведений.
+titles_changed = Signal()
+
+
+@receiver(pre_save, sender=Review)
+def update_title_stats_on_save(sender, instance, using, **kwargs):
+    """
+    Учитывает новую или изменённую оценку в агрегатах произведения.
+
+    Выполняется до записи отзыва в той же транзакции (см. Review.save):
+    прежняя оценка берётся из строки отзыва в БД, а не из загруженного
+    объекта, поэтому параллельные изменения не сбивают агрегаты.
+    """
+    titles = Title.objects.using(using).filter(pk=instance.title_id)
+    if instance._state.adding:
+        titles.apply_review_score(added=instance.score)
+    elif not titles.apply_review_score(
+        added=instance.score,
+        removed=Review.objects.using(using).filter(pk=instance.pk).exclude(
+            score=instance.score
+        )
+    ):
+        # оценка в БД не изменилась
+        return
+    titles_changed.send(
+        sender=Title, title_ids=(instance.title_id,), using=using
+    )
+
+
+@receiver(pre_delete, sender=Review)
+def update_title_stats_on_delete(sender, instance, using, **kwargs):
+    """
+    Снимает оценку удаляемого отзыва, в том числе при каскаде.
+
+    Если строки отзыва уже нет (повторное удаление устаревшего объекта),
+    агрегаты не меняются.
+    """
+    if Title.objects.using(using).filter(
+        pk=instance.title_id
+    ).apply_review_score(
+        removed=Review.objects.using(using).filter(pk=instance.pk)
+    ):
+        titles_changed.send(
+            sender=Title, title_ids=(instance.title_id,), using=using
+        )
+
+
+@receiver(post_save, sender=Comment)
+def update_review_on_comment_save(sender, instance, created, using,
+                                  **kwargs):
+    """
+    Учитывает новый комментарий в счётчике отзыва.
+
+    Дата изменения отзыва сдвигается при любом изменении комментария:
+    число и последние комментарии входят в представление отзыва (ETag).
+    """
+    Review.objects.using(using).filter(pk=instance.review_id).update(
+        comment_count=F('comment_count') + int(created),
+        updated_at=timezone.now()
+    )
+
+
+@receiver(pre_delete, sender=Comment)
+def update_review_on_comment_delete(sender, instance, using, **kwargs):
+    """Счётчик уменьшается, только если строка комментария ещё есть."""
+    Review.objects.using(using).filter(
+        Exists(Comment.objects.using(using).filter(pk=instance.pk)),
+        pk=instance.review_id
+    ).update(
+        comment_count=F('comment_count') - 1,
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Title)
+def index_title(sender, instance, using, **kwargs):
+    search.index_titles((instance.pk,), using)
+
+
+@receiver(post_delete, sender=Title)
+def unindex_title(sender, instance, using, **kwargs):
+    search.remove_titles((instance.pk,), using)
+
+
+def refresh_titles(title_ids, using):
+    """Жанры и категории входят в индекс и в представление произведения."""
+    title_ids = list(title_ids)
+    if not title_ids:
+        return
+    search.index_titles(title_ids, using)
+    Title.objects.using(using).filter(pk__in=title_ids).touch()
+    titles_changed.send(
+        sender=Title, title_ids=title_ids, using=using, related=True
+    )
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_changed(sender, instance, action, reverse, pk_set, using,
+                         **kwargs):
+    if action == 'pre_clear' and reverse:
+        # при очистке со стороны жанра pk_set не передаётся
+        instance._cleared_title_ids = list(
+            instance.title_set.values_list('pk', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_titles((instance.pk,), using)
+    elif action == 'post_clear':
+        refresh_titles(instance.__dict__.pop('_cleared_title_ids', ()), using)
+    else:
+        refresh_titles(pk_set, using)
+
+
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Category)
+def remember_related_titles(sender, instance, **kwargs):
+    """Связи удаляются каскадом без m2m_changed, запоминаем их заранее."""
+    instance._related_title_ids = list(
+        instance.titles.values_list('pk', flat=True)
+        if sender is Category
+        else instance.title_set.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+def related_titles_changed(sender, instance, using, created=False,
+                           **kwargs):
+    if created:
+        return
+    title_ids = getattr(instance, '_related_title_ids', None)
+    if title_ids is None:
+        related = instance.titles if sender is Category else instance.title_set
+        title_ids = related.values_list('pk', flat=True)
+    refresh_titles(title_ids, using)
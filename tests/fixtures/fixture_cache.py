@@ -0,0 +1,19 @@
+import pytest
+from django.test import override_settings
+
+
+@pytest.fixture(scope='session', autouse=True)
+def shared_cache_dir(tmp_path_factory):
+    """Отдельный каталог shared-кэша, чтобы тесты не трогали кэш сервера."""
+    location = str(tmp_path_factory.mktemp('shared_cache'))
+    caches = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        },
+    }
+    with override_settings(CACHES=caches):
+        yield location
@@ -0,0 +1,124 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Category, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08TitleStats:
+
+    @pytest.fixture
+    def title(self):
+        category = Category.objects.create(name='Фильм', slug='films')
+        return Title.objects.create(name='Титаник', year=1997,
+                                    category=category)
+
+    def test_01_stats_follow_reviews(self, title, user, admin, moderator):
+        Review.objects.create(title=title, author=user, text='1', score=4)
+        review = Review.objects.create(
+            title=title, author=admin, text='2', score=8
+        )
+        title.refresh_from_db()
+        assert (title.rating_sum, title.review_count, title.rating) == (
+            12, 2, 6
+        ), (
+            'Проверьте, что при создании отзыва у произведения обновляются '
+            'сумма оценок, количество отзывов и рейтинг.'
+        )
+
+        review = Review.objects.get(pk=review.pk)
+        review.score = 2
+        review.save()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating) == (6, 3), (
+            'Проверьте, что при изменении оценки рейтинг произведения '
+            'пересчитывается.'
+        )
+        assert title.score_histogram == [0, 1, 0, 1, 0, 0, 0, 0, 0, 0], (
+            'Проверьте, что распределение оценок обновляется вместе с '
+            'рейтингом.'
+        )
+
+        review.delete()
+        title.refresh_from_db()
+        assert (title.review_count, title.rating) == (1, 4), (
+            'Проверьте, что при удалении отзыва его оценка снимается с '
+            'произведения.'
+        )
+
+        moderator_review = Review.objects.create(
+            title=title, author=moderator, text='3', score=10
+        )
+        moderator.delete()
+        title.refresh_from_db()
+        assert not Review.objects.filter(pk=moderator_review.pk).exists()
+        assert (title.review_count, title.rating) == (1, 4), (
+            'Проверьте, что каскадное удаление отзывов обновляет рейтинг.'
+        )
+
+        user.delete()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.review_count, title.rating) == (
+            0, 0, None
+        ), 'Если отзывов нет - рейтинг произведения должен быть `None`.'
+
+    def test_02_rebuild_command(self, title, user, admin):
+        Review.objects.bulk_create([
+            Review(title=title, author=user, text='1', score=3),
+            Review(title=title, author=admin, text='2', score=6),
+        ])
+        call_command('rebuild_title_stats', stdout=StringIO())
+        title.refresh_from_db()
+        assert (title.rating_sum, title.review_count, title.rating) == (
+            9, 2, 4.5
+        ), (
+            'Проверьте, что команда `rebuild_title_stats` пересчитывает '
+            'агрегаты по отзывам.'
+        )
+        assert title.score_histogram == [0, 0, 1, 0, 0, 1, 0, 0, 0, 0]
+
+    def test_03_histogram_field(self, client, title, user):
+        Review.objects.create(title=title, author=user, text='1', score=7)
+        url = f'/api/v1/titles/{title.id}/'
+        assert 'score_histogram' not in client.get(url).json()
+        data = client.get(url, {'include': 'score_histogram'}).json()
+        assert data['score_histogram'] == [0, 0, 0, 0, 0, 0, 1, 0, 0, 0], (
+            'Проверьте, что при `?include=score_histogram` в ответе есть '
+            'распределение оценок произведения.'
+        )
+
+    def test_04_stale_instances(self, title, user, admin):
+        Review.objects.create(title=title, author=user, text='1', score=5)
+        review = Review.objects.create(
+            title=title, author=admin, text='2', score=5
+        )
+        first = Review.objects.get(pk=review.pk)
+        second = Review.objects.get(pk=review.pk)
+
+        first.score = 9
+        first.save()
+        second.score = 7
+        second.save()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.score_7, title.score_9) == (
+            12, 1, 0
+        ), (
+            'Прежняя оценка должна браться из БД, а не из загруженного '
+            'объекта.'
+        )
+
+        first.delete()
+        second.delete()
+        title.refresh_from_db()
+        assert (title.review_count, title.rating_sum, title.score_5) == (
+            1, 5, 1
+        ), (
+            'Повторное удаление устаревшего объекта не должно менять '
+            'агрегаты произведения.'
+        )
+        Review.objects.get(author=user).delete()
+        Review(pk=review.pk, title=title, author=admin, score=5).delete()
+        title.refresh_from_db()
+        assert (title.review_count, title.rating_sum) == (0, 0)
@@ -0,0 +1,52 @@
+import pytest
+
+from api.cache import category_lookup, genre_lookup
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09QueryCount:
+
+    TITLES_URL = '/api/v1/titles/'
+    TITLES_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
+
+    @pytest.fixture
+    def titles(self):
+        categories = [
+            Category.objects.create(name=f'Категория {i}', slug=f'cat-{i}')
+            for i in range(3)
+        ]
+        genres = [
+            Genre.objects.create(name=f'Жанр {i}', slug=f'genre-{i}')
+            for i in range(4)
+        ]
+        titles = []
+        for i in range(12):
+            title = Title.objects.create(
+                name=f'Произведение {i}', year=1950 + i,
+                category=categories[i % 3]
+            )
+            title.genre.set(genres[:i % 4 + 1])
+            titles.append(title)
+        # справочники жанров и категорий загружаются один раз на процесс
+        genre_lookup.load()
+        category_lookup.load()
+        return titles
+
+    @pytest.mark.parametrize('limit', (1, 5, 12))
+    def test_01_title_list_queries(self, client, titles, limit,
+                                   django_assert_num_queries):
+        # COUNT вместе с ETag, страница, id жанров одним запросом
+        with django_assert_num_queries(3):
+            response = client.get(self.TITLES_URL, {'limit': limit})
+        results = response.json()['results']
+        assert len(results) == limit
+        assert all(title['genre'] and title['category'] for title in results)
+
+    def test_02_title_detail_queries(self, client, titles,
+                                     django_assert_num_queries):
+        with django_assert_num_queries(2):
+            response = client.get(
+                self.TITLES_DETAIL_URL_TEMPLATE.format(title_id=titles[-1].id)
+            )
+        assert len(response.json()['genre']) == 4
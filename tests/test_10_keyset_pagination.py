@@ -0,0 +1,93 @@
+import base64
+import json
+
+import pytest
+
+from api.cache import category_lookup
+from reviews.models import Category, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10KeysetPagination:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    @pytest.fixture
+    def titles(self):
+        category = Category.objects.create(name='Книги', slug='books')
+        # справочник категорий загружается один раз на процесс
+        category_lookup.load()
+        return [
+            Title.objects.create(
+                name=f'Произведение {i}', year=1990 + i // 4,
+                category=category
+            )
+            for i in range(11)
+        ]
+
+    def test_01_walk_forward_and_back(self, client, titles,
+                                      django_assert_num_queries):
+        expected = [
+            title.id for title in sorted(
+                titles, key=lambda title: (title.year, title.id),
+                reverse=True
+            )
+        ]
+        # страница и id жанров: ETag считается по записям страницы
+        with django_assert_num_queries(2):
+            response = client.get(self.TITLES_URL, {'cursor': '', 'limit': 3})
+        data = response.json()
+        assert 'count' not in data, (
+            'В режиме курсорной пагинации ключ `count` не возвращается.'
+        )
+        assert data['previous'] is None
+
+        pages = [[title['id'] for title in data['results']]]
+        while data['next']:
+            data = client.get(data['next']).json()
+            pages.append([title['id'] for title in data['results']])
+        assert sum(pages, []) == expected, (
+            'Проверьте, что курсорная пагинация проходит все произведения '
+            'по убыванию года без повторов и пропусков.'
+        )
+
+        for page in reversed(pages[:-1]):
+            data = client.get(data['previous']).json()
+            assert [title['id'] for title in data['results']] == page
+        assert data['previous'] is None
+
+    def test_02_invalid_cursor(self, client, titles):
+        response = client.get(self.TITLES_URL, {'cursor': 'garbage'})
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize('position', (['abc', 1], [None, None],
+                                          [1997, {'id': 1}]))
+    def test_02_wrongly_typed_cursor(self, client, titles, position):
+        cursor = base64.urlsafe_b64encode(
+            json.dumps({'p': position, 'r': 0}).encode()
+        ).decode()
+        response = client.get(self.TITLES_URL, {'cursor': cursor})
+        assert response.status_code == 404, (
+            'Курсор с неверными типами значений должен давать 404, '
+            'а не ошибку сервера.'
+        )
+
+    def test_03_offset_is_default(self, client, titles):
+        data = client.get(self.TITLES_URL).json()
+        assert data['count'] == len(titles)
+
+    def test_04_empty_page_links_stay_in_cursor_mode(self, client, titles):
+        for position, reverse in (([1900, 1], 0), ([2100, 1], 1)):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'p': position, 'r': reverse}).encode()
+            ).decode()
+            data = client.get(self.TITLES_URL, {'cursor': cursor}).json()
+            assert data['results'] == []
+            link = data['next'] if reverse else data['previous']
+            assert link is not None and 'cursor=' in link, (
+                'Ссылка с пустой страницы должна оставлять клиента в режиме '
+                'курсорной пагинации.'
+            )
+            data = client.get(link).json()
+            assert 'count' not in data
+            assert len(data['results']) == 10
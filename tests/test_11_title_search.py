@@ -0,0 +1,109 @@
+import pytest
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11TitleSearch:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    @pytest.fixture
+    def titles(self):
+        films = Category.objects.create(name='Фильм', slug='films')
+        books = Category.objects.create(name='Книга', slug='books')
+        drama = Genre.objects.create(name='Драма', slug='drama')
+        fantasy = Genre.objects.create(name='Фэнтези', slug='fantasy')
+        war = Title.objects.create(
+            name='Война и мир', year=1869, category=books,
+            description='Роман-эпопея о войне'
+        )
+        war.genre.set([drama])
+        rings = Title.objects.create(
+            name='Властелин колец', year=2001, category=films,
+            description='Война за кольцо всевластья'
+        )
+        rings.genre.set([fantasy])
+        return war, rings
+
+    def search(self, client, query):
+        response = client.get(self.TITLES_URL, {'search': query})
+        assert response.status_code == 200
+        return [title['id'] for title in response.json()['results']]
+
+    def test_01_search_fields(self, client, titles):
+        war, rings = titles
+        assert self.search(client, 'властел') == [rings.id], (
+            'Проверьте, что поиск находит произведение по началу слова '
+            'в названии.'
+        )
+        assert self.search(client, 'drama') == [war.id]
+        assert self.search(client, 'фильм') == [rings.id]
+        assert self.search(client, 'кольцо') == [rings.id], (
+            'Проверьте, что поиск учитывает описание произведения.'
+        )
+        assert self.search(client, 'войн') == [war.id, rings.id], (
+            'Проверьте, что результаты поиска упорядочены по релевантности.'
+        )
+        assert self.search(client, 'войн books') == [war.id]
+
+    def test_02_substring_and_yo(self, client, titles):
+        war, rings = titles
+        assert self.search(client, 'ilms') == [rings.id], (
+            'Проверьте, что поиск, как и раньше, находит часть слова '
+            'не только в его начале.'
+        )
+        assert self.search(client, 'ЛАСТЕЛ') == [rings.id]
+        assert set(self.search(client, 'и')) == {war.id, rings.id}, (
+            'Проверьте, что работают и слова короче трёх символов.'
+        )
+        tree = Title.objects.create(name='Ёлка', year=2010)
+        assert self.search(client, 'елка') == [tree.id], (
+            'Проверьте, что поиск не различает «е» и «ё».'
+        )
+        assert self.search(client, 'ЁЛК') == [tree.id]
+
+    def test_03_index_follows_changes(self, client, titles):
+        war, rings = titles
+        Genre.objects.filter(slug='drama').get().delete()
+        assert self.search(client, 'драма') == []
+
+        fantasy = Genre.objects.get(slug='fantasy')
+        fantasy.name = 'Сказка'
+        fantasy.save()
+        assert self.search(client, 'сказка') == [rings.id]
+
+        war.genre.add(fantasy)
+        assert set(self.search(client, 'сказка')) == {war.id, rings.id}
+
+        rings.delete()
+        assert self.search(client, 'сказка') == [war.id]
+
+    def test_04_casefolded_name_lookup(self, client, titles):
+        war, rings = titles
+        response = client.get('/api/v1/genres/', {'search': 'ДРА'})
+        assert [genre['slug'] for genre in response.json()['results']] == [
+            'drama'
+        ], (
+            'Проверьте, что поиск жанров по началу названия не зависит '
+            'от регистра кириллицы.'
+        )
+        response = client.get('/api/v1/categories/', {'search': 'книга'})
+        assert [cat['slug'] for cat in response.json()['results']] == [
+            'books'
+        ]
+        assert 'search_name' not in response.json()['results'][0]
+
+        response = client.get(self.TITLES_URL, {'name': 'ВОЙНА  и Мир'})
+        assert [title['id'] for title in response.json()['results']] == [
+            war.id
+        ], (
+            'Проверьте, что фильтр `name` сравнивает название '
+            'без учёта регистра.'
+        )
+
+        Genre.objects.create(name='Ёлочные сказки', slug='tree')
+        response = client.get('/api/v1/genres/', {'search': 'елоч'})
+        assert [genre['slug'] for genre in response.json()['results']] == [
+            'tree'
+        ]
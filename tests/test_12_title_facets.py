@@ -0,0 +1,66 @@
+import pytest
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12TitleFacets:
+
+    FACETS_URL = '/api/v1/titles/facets/'
+
+    @pytest.fixture
+    def titles(self):
+        films = Category.objects.create(name='Фильм', slug='films')
+        books = Category.objects.create(name='Книга', slug='books')
+        drama = Genre.objects.create(name='Драма', slug='drama')
+        comedy = Genre.objects.create(name='Комедия', slug='comedy')
+        data = (
+            ('Один', 1991, films, (drama,)),
+            ('Два', 1995, films, (drama, comedy)),
+            ('Три', 2003, books, (comedy,)),
+            ('Четыре', 2005, None, ()),
+        )
+        for name, year, category, genres in data:
+            title = Title.objects.create(name=name, year=year,
+                                         category=category)
+            title.genre.set(genres)
+
+    def test_01_facets(self, client, titles, django_assert_num_queries):
+        with django_assert_num_queries(2):
+            response = client.get(self.FACETS_URL)
+        assert response.status_code == 200, (
+            f'Проверьте, что GET-запрос к `{self.FACETS_URL}` возвращает '
+            'ответ со статусом 200.'
+        )
+        assert response.json() == {
+            'count': 4,
+            'genre': [
+                {'slug': 'drama', 'name': 'Драма', 'count': 2},
+                {'slug': 'comedy', 'name': 'Комедия', 'count': 2},
+            ],
+            'category': [
+                {'slug': 'films', 'name': 'Фильм', 'count': 2},
+                {'slug': 'books', 'name': 'Книга', 'count': 1},
+            ],
+            'decade': [
+                {'decade': 1990, 'count': 2},
+                {'decade': 2000, 'count': 2},
+            ],
+        }
+
+    def test_02_facets_respect_filters(self, client, titles):
+        data = client.get(self.FACETS_URL, {'genre': 'comedy'}).json()
+        assert data['count'] == 2
+        assert data['genre'] == [
+            {'slug': 'comedy', 'name': 'Комедия', 'count': 2},
+            {'slug': 'drama', 'name': 'Драма', 'count': 1},
+        ]
+        assert data['decade'] == [
+            {'decade': 1990, 'count': 1}, {'decade': 2000, 'count': 1}
+        ]
+
+        data = client.get(self.FACETS_URL, {'search': 'три'}).json()
+        assert data['count'] == 1
+        assert data['category'] == [
+            {'slug': 'books', 'name': 'Книга', 'count': 1}
+        ]
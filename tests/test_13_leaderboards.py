@@ -0,0 +1,68 @@
+import pytest
+
+from reviews.models import Category, Genre, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13Leaderboards:
+
+    LEADERBOARDS_URL = '/api/v1/leaderboards/'
+
+    @pytest.fixture
+    def titles(self, django_user_model):
+        films = Category.objects.create(name='Фильм', slug='films')
+        books = Category.objects.create(name='Книга', slug='books')
+        drama = Genre.objects.create(name='Драма', slug='drama')
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'author{i}', email=f'author{i}@yamdb.fake'
+            )
+            for i in range(4)
+        ]
+        scores = {
+            # одна десятка не должна обогнать много девяток
+            'single': (films, (10,)),
+            'solid': (films, (9, 9, 9, 9)),
+            'book': (books, (8, 8, 8)),
+            'nobody': (books, ()),
+        }
+        titles = {}
+        for name, (category, title_scores) in scores.items():
+            title = Title.objects.create(name=name, year=2000,
+                                         category=category)
+            title.genre.set([drama])
+            for author, score in zip(authors, title_scores):
+                Review.objects.create(title=title, author=author,
+                                      text='text', score=score)
+            titles[name] = title.id
+        return titles
+
+    def names(self, client, **params):
+        response = client.get(self.LEADERBOARDS_URL, params)
+        assert response.status_code == 200, (
+            f'Проверьте, что GET-запрос к `{self.LEADERBOARDS_URL}` '
+            'возвращает ответ со статусом 200.'
+        )
+        return [title['name'] for title in response.json()]
+
+    def test_01_top_rated(self, client, titles):
+        assert self.names(client) == ['solid', 'book', 'single'], (
+            'Проверьте, что лидерборд упорядочен по взвешенному рейтингу и '
+            'не содержит произведений без отзывов.'
+        )
+        assert self.names(client, min_reviews=3) == ['solid', 'book']
+        assert self.names(client, category='films') == ['solid', 'single']
+        assert self.names(client, genre='drama', limit=1) == ['solid']
+
+    def test_02_most_reviewed(self, client, titles):
+        assert self.names(client, order='reviews') == [
+            'solid', 'book', 'single'
+        ]
+
+    def test_03_updates_with_reviews(self, client, titles):
+        Review.objects.filter(title_id=titles['solid']).delete()
+        assert self.names(client) == ['book', 'single']
+
+    def test_04_invalid_params(self, client, titles):
+        response = client.get(self.LEADERBOARDS_URL, {'order': 'year'})
+        assert response.status_code == 400
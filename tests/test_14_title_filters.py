@@ -0,0 +1,63 @@
+import pytest
+
+from reviews.models import Category, Genre, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14TitleFilters:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    @pytest.fixture
+    def titles(self, user):
+        films = Category.objects.create(name='Фильм', slug='films')
+        books = Category.objects.create(name='Книга', slug='books')
+        music = Category.objects.create(name='Музыка', slug='music')
+        drama = Genre.objects.create(name='Драма', slug='drama')
+        comedy = Genre.objects.create(name='Комедия', slug='comedy')
+        data = (
+            ('a', 1985, films, (drama,), 9),
+            ('b', 1992, films, (drama, comedy), 8),
+            ('c', 1999, books, (comedy,), 5),
+            ('d', 2004, music, (), None),
+        )
+        for name, year, category, genres, score in data:
+            title = Title.objects.create(name=name, year=year,
+                                         category=category)
+            title.genre.set(genres)
+            if score:
+                Review.objects.create(title=title, author=user,
+                                      text='text', score=score)
+
+    def names(self, client, **params):
+        response = client.get(self.TITLES_URL, params)
+        assert response.status_code == 200
+        return sorted(title['name'] for title in response.json()['results'])
+
+    def test_01_ranges(self, client, titles):
+        assert self.names(client, year_min=1990, year_max=2000) == [
+            'b', 'c'
+        ], 'Проверьте фильтрацию произведений по диапазону лет.'
+        assert self.names(client, rating_min=8) == ['a', 'b'], (
+            'Проверьте фильтрацию произведений по минимальному рейтингу.'
+        )
+        assert self.names(client, year_min=1990, rating_max=8) == ['b', 'c']
+
+    def test_02_multiple_values(self, client, titles):
+        assert self.names(client, genre='drama,comedy') == ['a', 'b', 'c'], (
+            'По умолчанию произведение должно подходить под любой из '
+            'переданных жанров.'
+        )
+        assert self.names(
+            client, genre='drama,comedy', genre_match='all'
+        ) == ['b'], (
+            'При `genre_match=all` произведение должно иметь все жанры.'
+        )
+        assert self.names(client, category='books,music') == ['c', 'd']
+        assert self.names(client, genre='drama', category='films') == [
+            'a', 'b'
+        ]
+
+    def test_03_no_duplicates(self, client, titles):
+        data = client.get(self.TITLES_URL, {'genre': 'drama,comedy'}).json()
+        assert data['count'] == 3
@@ -0,0 +1,128 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15TitleBulk:
+
+    BULK_URL = '/api/v1/titles/bulk/'
+
+    @pytest.fixture
+    def catalog(self):
+        Category.objects.create(name='Фильм', slug='films')
+        Category.objects.create(name='Книга', slug='books')
+        Genre.objects.create(name='Драма', slug='drama')
+        Genre.objects.create(name='Комедия', slug='comedy')
+
+    def test_01_permissions(self, client, user_client, catalog):
+        data = [{'name': 'a', 'year': 2000, 'genre': [], 'category': 'films'}]
+        assert client.post(
+            self.BULK_URL, data, content_type='application/json'
+        ).status_code == HTTPStatus.UNAUTHORIZED
+        assert user_client.post(
+            self.BULK_URL, data, format='json'
+        ).status_code == HTTPStatus.FORBIDDEN
+
+    def test_02_bulk_create(self, admin_client, catalog):
+        data = [
+            {'name': 'Один', 'year': 1990, 'genre': ['drama', 'comedy'],
+             'category': 'films'},
+            {'name': 'Два', 'year': 1991, 'genre': ['nope'],
+             'category': 'films'},
+            {'name': 'Три', 'year': 1992, 'genre': ['comedy'],
+             'category': 'books', 'description': 'Описание'},
+            {'name': 'Четыре', 'year': 3000, 'genre': [],
+             'category': 'unknown'},
+        ]
+        response = admin_client.post(self.BULK_URL, data, format='json')
+        assert response.status_code == HTTPStatus.MULTI_STATUS, (
+            'Если часть элементов пакета некорректна, должен вернуться ответ '
+            'со статусом 207.'
+        )
+        results = response.json()
+        assert [result.get('name') for result in results] == [
+            'Один', None, 'Три', None
+        ]
+        assert 'genre' in results[1]['errors']
+        assert set(results[3]['errors']) == {'year', 'category'}
+        assert [genre['slug'] for genre in results[0]['genre']] == [
+            'drama', 'comedy'
+        ]
+        assert Title.objects.count() == 2, (
+            'Проверьте, что ошибки отдельных элементов не мешают сохранить '
+            'остальные.'
+        )
+        title = Title.objects.get(pk=results[2]['id'])
+        assert title.search_name == 'три'
+        assert client_search(admin_client, 'комед') == {
+            results[0]['id'], results[2]['id']
+        }
+
+    def test_03_bulk_update(self, admin_client, catalog):
+        title = Title.objects.create(
+            name='Старое', year=1990, category=Category.objects.get(
+                slug='films'
+            )
+        )
+        title.genre.set(Genre.objects.filter(slug='drama'))
+        response = admin_client.post(self.BULK_URL, [
+            {'id': title.id, 'name': 'Новое', 'genre': ['comedy']},
+            {'id': 100500, 'name': 'Нет такого'},
+        ], format='json')
+        assert response.status_code == HTTPStatus.MULTI_STATUS
+        title.refresh_from_db()
+        assert (title.name, title.year) == ('Новое', 1990)
+        assert list(title.genre.values_list('slug', flat=True)) == ['comedy']
+        assert 'id' in response.json()[1]['errors']
+
+    def test_04_repeated_id(self, admin_client, catalog):
+        title = Title.objects.create(name='Старое', year=1990)
+        response = admin_client.post(self.BULK_URL, [
+            {'id': title.id, 'genre': ['drama']},
+            {'id': title.id, 'genre': ['drama']},
+        ], format='json')
+        assert response.status_code == HTTPStatus.MULTI_STATUS, (
+            'Повторное изменение произведения в пакете должно быть ошибкой '
+            'элемента, а не всего запроса.'
+        )
+        results = response.json()
+        assert results[0]['id'] == title.id
+        assert 'id' in results[1]['errors']
+        assert list(title.genre.values_list('slug', flat=True)) == ['drama']
+
+        response = admin_client.post(self.BULK_URL, [
+            {'id': title.id, 'year': 'bad'},
+            {'id': title.id, 'name': 'Новое'},
+        ], format='json')
+        assert response.status_code == HTTPStatus.MULTI_STATUS
+        assert 'year' in response.json()[0]['errors']
+        title.refresh_from_db()
+        assert title.name == 'Новое', (
+            'Элемент с ошибкой не должен мешать изменить то же '
+            'произведение следующим элементом.'
+        )
+
+    def test_05_string_id(self, admin_client, catalog):
+        title = Title.objects.create(name='Старое', year=1990)
+        response = admin_client.post(
+            self.BULK_URL, [{'id': str(title.id), 'name': 'Новое'}],
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'id, переданный строкой, должен находить произведение.'
+        )
+        title.refresh_from_db()
+        assert title.name == 'Новое'
+
+    def test_06_invalid_payload(self, admin_client, catalog):
+        for data in ({'name': 'a'}, []):
+            response = admin_client.post(self.BULK_URL, data, format='json')
+            assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def client_search(client, query):
+    response = client.get('/api/v1/titles/', {'search': query})
+    return {title['id'] for title in response.json()['results']}
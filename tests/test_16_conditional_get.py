@@ -0,0 +1,86 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Category, Comment, Genre, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16ConditionalGet:
+
+    TITLES_URL = '/api/v1/titles/'
+    TITLE_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
+    COMMENTS_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+    )
+
+    @pytest.fixture
+    def title(self):
+        category = Category.objects.create(name='Фильм', slug='films')
+        genre = Genre.objects.create(name='Драма', slug='drama')
+        title = Title.objects.create(name='Титаник', year=1997,
+                                     category=category)
+        title.genre.set([genre])
+        return title
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_01_title_detail(self, client, title, user,
+                             django_assert_num_queries):
+        url = self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=title.id)
+        response = client.get(url)
+        assert response.has_header('ETag') and response.has_header(
+            'Last-Modified'
+        ), (
+            f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+            'заголовки ETag и Last-Modified.'
+        )
+        # только загрузка произведения: жанры нужны лишь для сериализации
+        with django_assert_num_queries(1):
+            cached = self.revalidate(client, url, response)
+        assert cached.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Если ETag не изменился, должен вернуться ответ со статусом 304.'
+        )
+        assert cached['ETag'] == response['ETag']
+        assert client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        ).status_code == HTTPStatus.NOT_MODIFIED
+
+        Review.objects.create(title=title, author=user, text='t', score=5)
+        assert self.revalidate(client, url, response).status_code == (
+            HTTPStatus.OK
+        ), 'Новый отзыв меняет рейтинг, а значит и ETag произведения.'
+
+        response = client.get(url)
+        Genre.objects.filter(slug='drama').update(name='Мелодрама')
+        genre = Genre.objects.get(slug='drama')
+        genre.save()
+        assert self.revalidate(client, url, response).status_code == (
+            HTTPStatus.OK
+        ), 'Переименование жанра меняет представление произведения.'
+
+    def test_02_lists(self, client, title, user):
+        response = client.get(self.TITLES_URL)
+        assert self.revalidate(
+            client, self.TITLES_URL, response
+        ).status_code == HTTPStatus.NOT_MODIFIED
+        assert client.get(
+            self.TITLES_URL, {'limit': 1}, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code == HTTPStatus.OK, (
+            'ETag списка должен зависеть от параметров страницы.'
+        )
+
+        review = Review.objects.create(title=title, author=user, text='t',
+                                       score=5)
+        Comment.objects.create(review=review, author=user, text='c')
+        url = self.COMMENTS_URL_TEMPLATE.format(title_id=title.id,
+                                                review_id=review.id)
+        response = client.get(url)
+        assert self.revalidate(client, url, response).status_code == (
+            HTTPStatus.NOT_MODIFIED
+        )
+        Comment.objects.get().delete()
+        assert self.revalidate(client, url, response).status_code == (
+            HTTPStatus.OK
+        ), 'Удаление комментария должно менять ETag списка.'
@@ -0,0 +1,57 @@
+import pytest
+
+from reviews.models import Category, Genre, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17SparseFields:
+
+    TITLES_URL = '/api/v1/titles/'
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+
+    @pytest.fixture
+    def title(self, user):
+        category = Category.objects.create(name='Фильм', slug='films')
+        genre = Genre.objects.create(name='Драма', slug='drama')
+        title = Title.objects.create(name='Титаник', year=1997,
+                                     category=category,
+                                     description='Очень длинное описание')
+        title.genre.set([genre])
+        Review.objects.create(title=title, author=user, text='Текст',
+                              score=7)
+        return title
+
+    def test_01_title_fields(self, client, title,
+                             django_assert_num_queries):
+        with django_assert_num_queries(2) as context:
+            response = client.get(self.TITLES_URL, {'fields': 'id,name'})
+        assert list(response.json()['results'][0]) == ['id', 'name'], (
+            'Проверьте, что `?fields=` оставляет в ответе только '
+            'перечисленные поля.'
+        )
+        page_sql = context.captured_queries[-1]['sql']
+        assert 'description' not in page_sql, (
+            'Проверьте, что незапрошенное описание не загружается из БД.'
+        )
+        assert 'reviews_category' not in page_sql
+
+        response = client.get(
+            self.TITLES_URL, {'exclude': 'genre,description'}
+        )
+        title_data = response.json()['results'][0]
+        assert 'genre' not in title_data and 'description' not in title_data
+        assert title_data['category'] == {'name': 'Фильм', 'slug': 'films'}
+        assert title_data['rating'] == 7
+
+    def test_02_review_fields(self, client, title):
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=title.id)
+        response = client.get(url, {'fields': 'id,score'})
+        assert list(response.json()['results'][0]) == ['id', 'score']
+
+    def test_03_writes_ignore_fields(self, admin_client, title):
+        response = admin_client.patch(
+            f'{self.TITLES_URL}{title.id}/?fields=id',
+            data={'name': 'Новое'}
+        )
+        assert response.status_code == 200
+        assert response.json()['name'] == 'Новое'
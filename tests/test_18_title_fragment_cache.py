@@ -0,0 +1,95 @@
+import pytest
+from django.core.cache import cache
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18TitleFragmentCache:
+
+    TITLES_URL = '/api/v1/titles/'
+    TITLE_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        cache.clear()
+        yield
+        cache.clear()
+
+    @pytest.fixture
+    def titles(self):
+        category = Category.objects.create(name='Фильм', slug='films')
+        genre = Genre.objects.create(name='Драма', slug='drama')
+        titles = []
+        for number in range(3):
+            title = Title.objects.create(name=f'Фильм {number}',
+                                         year=2000 + number,
+                                         category=category)
+            title.genre.set([genre])
+            titles.append(title)
+        return titles
+
+    def get_title(self, client, title):
+        return client.get(
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=title.id)
+        ).json()
+
+    def test_01_list_hit_skips_relations(self, client, titles,
+                                         django_assert_num_queries):
+        first = client.get(self.TITLES_URL).json()
+        # агрегат для ETag и страница, жанры берутся из кэша
+        with django_assert_num_queries(2):
+            second = client.get(self.TITLES_URL).json()
+        assert first == second, (
+            'Ответ из кэша фрагментов должен совпадать с исходным.'
+        )
+
+    def test_02_detail_hit(self, client, titles, django_assert_num_queries):
+        first = self.get_title(client, titles[0])
+        with django_assert_num_queries(1):
+            second = self.get_title(client, titles[0])
+        assert first == second, (
+            'Ответ из кэша фрагментов должен совпадать с исходным.'
+        )
+
+    def test_03_invalidation(self, client, admin_client, user_client,
+                             titles):
+        title = titles[0]
+        self.get_title(client, title)
+
+        user_client.post(
+            self.REVIEWS_URL_TEMPLATE.format(title_id=title.id),
+            data={'text': 'Отлично', 'score': 9}
+        )
+        assert self.get_title(client, title)['rating'] == 9, (
+            'После нового отзыва рейтинг произведения в ответе должен '
+            'обновиться.'
+        )
+
+        response = admin_client.patch(
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=title.id),
+            data={'name': 'Новое название'},
+            format='json'
+        )
+        assert response.status_code == 200, (
+            'Администратор должен иметь возможность изменить произведение.'
+        )
+        assert self.get_title(client, title)['name'] == 'Новое название', (
+            'После изменения произведения ответ не должен браться из кэша.'
+        )
+
+        Genre.objects.filter(slug='drama').get().delete()
+        assert self.get_title(client, title)['genre'] == [], (
+            'После удаления жанра он должен пропасть из ответа.'
+        )
+
+    def test_04_stale_version_ignored(self, client, titles):
+        title = titles[0]
+        self.get_title(client, title)
+        # изменение в обход сигналов: кэш устаревает по версии
+        Title.objects.filter(pk=title.pk).update(name='Обход')
+        Title.objects.filter(pk=title.pk).touch()
+        assert self.get_title(client, title)['name'] == 'Обход', (
+            'Фрагмент с устаревшей версией не должен использоваться.'
+        )
@@ -0,0 +1,153 @@
+import os
+import subprocess
+import sys
+from http import HTTPStatus
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.cache import (LookupCache, category_lookup, genre_lookup,
+                       shared_cache)
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19LookupCache:
+
+    TITLES_URL = '/api/v1/titles/'
+    GENRES_URL = '/api/v1/genres/'
+    CATEGORIES_URL = '/api/v1/categories/'
+
+    @pytest.fixture(autouse=True)
+    def lookups(self):
+        cache.clear()
+        shared_cache.clear()
+        Category.objects.create(name='Фильм', slug='films')
+        Genre.objects.create(name='Драма', slug='drama')
+        genre_lookup.load()
+        category_lookup.load()
+
+    def test_01_title_write_uses_lookup(self, admin_client):
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.post(
+                self.TITLES_URL,
+                data={'name': 'Титаник', 'year': 1997,
+                      'genre': ['drama'], 'category': 'films'},
+                format='json'
+            )
+        assert response.status_code == HTTPStatus.CREATED
+        # поиск по слагу: слаг в условии WHERE
+        lookups = [
+            query['sql'] for query in context.captured_queries
+            if ' WHERE ' in query['sql']
+            and '."slug" ' in query['sql'].split(' WHERE ', 1)[1]
+        ]
+        assert not lookups, (
+            'Слаги жанров и категорий при записи произведения должны '
+            'браться из справочника в памяти.'
+        )
+        assert response.json()['genre'] == [
+            {'name': 'Драма', 'slug': 'drama'}
+        ]
+        assert response.json()['category'] == {
+            'name': 'Фильм', 'slug': 'films'
+        }
+
+    def test_02_viewset_write_bumps_version(self, admin_client):
+        versions = (genre_lookup.current_version(),
+                    category_lookup.current_version())
+        admin_client.post(self.GENRES_URL,
+                          data={'name': 'Комедия', 'slug': 'comedy'})
+        admin_client.post(self.CATEGORIES_URL,
+                          data={'name': 'Книга', 'slug': 'books'})
+        assert genre_lookup.current_version() != versions[0], (
+            'Создание жанра должно менять версию справочника жанров.'
+        )
+        assert category_lookup.current_version() != versions[1], (
+            'Создание категории должно менять версию справочника категорий.'
+        )
+        assert 'comedy' in genre_lookup.load()[1]
+        assert 'books' in category_lookup.load()[1]
+
+    def test_03_other_process_reloads(self, settings, shared_cache_dir):
+        settings.LOOKUP_VERSION_CHECK_INTERVAL = 0
+        assert 'locmem' not in settings.CACHES['shared']['BACKEND'], (
+            'Версии справочников должны храниться в общем для процессов кэше.'
+        )
+        stale = genre_lookup.load()
+        Genre.objects.filter(slug='drama').update(name='Мелодрама')
+        # версию поднимает другой процесс, как воркер, принявший запись
+        subprocess.run(
+            (sys.executable, 'manage.py', 'shell', '-c',
+             'from api.cache import genre_lookup; genre_lookup.bump()'),
+            cwd=settings.BASE_DIR, check=True,
+            env={**os.environ, 'SHARED_CACHE_DIR': shared_cache_dir}
+        )
+        assert genre_lookup.load() is not stale
+        assert genre_lookup.load()[1]['drama'].name == 'Мелодрама', (
+            'После смены версии в другом процессе справочник должен '
+            'перечитываться из БД.'
+        )
+
+    def test_04_unknown_slug_falls_back_to_db(self, admin_client):
+        # жанр добавлен в обход сигналов, версия не изменилась
+        Genre.objects.bulk_create([Genre(name='Ужасы', slug='horror')])
+        response = admin_client.post(
+            self.TITLES_URL,
+            data={'name': 'Оно', 'year': 2017,
+                  'genre': ['horror'], 'category': 'films'},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Слаг, которого ещё нет в справочнике, должен искаться в БД.'
+        )
+        title = Title.objects.get(name='Оно')
+        assert list(title.genre.values_list('slug', flat=True)) == ['horror']
+
+    def test_05_version_checked_once_per_interval(self, client, settings,
+                                                  monkeypatch):
+        settings.LOOKUP_VERSION_CHECK_INTERVAL = 60
+        calls = []
+        current_version = LookupCache.current_version
+
+        def counting_version(lookup):
+            calls.append(lookup)
+            return current_version(lookup)
+
+        monkeypatch.setattr(LookupCache, 'current_version', counting_version)
+        genre = Genre.objects.get(slug='drama')
+        for number in range(5):
+            Title.objects.create(name=f'Фильм {number}', year=2000,
+                                 category=Category.objects.get(slug='films')
+                                 ).genre.set([genre])
+        assert client.get(self.TITLES_URL).status_code == HTTPStatus.OK
+        assert not calls, (
+            'Справочник не должен обращаться к shared-кэшу за версией при '
+            'каждом чтении связанного объекта.'
+        )
+
+    def test_06_stale_lookup_does_not_pin_fragments(self, client, settings):
+        settings.LOOKUP_VERSION_CHECK_INTERVAL = 60
+        title = Title.objects.create(name='Титаник', year=1997)
+        title.genre.set(Genre.objects.filter(slug='drama'))
+        genre_lookup.load()
+        # жанр переименован в другом процессе: версия в shared-кэше новая,
+        # а этот процесс ещё не перепроверял свой справочник
+        Genre.objects.filter(slug='drama').update(name='Мелодрама')
+        Title.objects.filter(pk=title.pk).update(updated_at=timezone.now())
+        shared_cache.set(genre_lookup.version_key, 'renamed', None)
+        stale = client.get(self.TITLES_URL)
+        assert stale.json()['results'][0]['genre'][0]['name'] == 'Драма'
+
+        settings.LOOKUP_VERSION_CHECK_INTERVAL = 0
+        fresh = client.get(self.TITLES_URL)
+        assert fresh.json()['results'][0]['genre'][0]['name'] == (
+            'Мелодрама'
+        ), (
+            'Фрагмент, собранный по устаревшему справочнику, не должен '
+            'отдаваться после того, как справочник перечитан.'
+        )
+        assert fresh['ETag'] != stale['ETag']
@@ -0,0 +1,90 @@
+from http import HTTPStatus
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20CountModes:
+
+    TITLES_URL = '/api/v1/titles/'
+    GENRES_URL = '/api/v1/genres/'
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        cache.clear()
+        yield
+        cache.clear()
+
+    @pytest.fixture
+    def titles(self):
+        category = Category.objects.create(name='Фильм', slug='films')
+        return [
+            Title.objects.create(name=f'Фильм {i}', year=2000 + i,
+                                 category=category)
+            for i in range(5)
+        ]
+
+    def test_01_skip_count(self, client, titles):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(
+                self.TITLES_URL, {'count': 'false', 'limit': 2}
+            )
+        assert not any(
+            'COUNT(' in query['sql'] for query in context.captured_queries
+        ), 'При `?count=false` COUNT(*) выполняться не должен.'
+        assert context.captured_queries[0]['sql'].endswith('LIMIT 3'), (
+            'Наличие следующей страницы определяется выборкой limit + 1.'
+        )
+        data = response.json()
+        assert 'count' not in data, (
+            'При `?count=false` поле `count` не должно возвращаться.'
+        )
+        assert [title['id'] for title in data['results']] == [
+            titles[4].id, titles[3].id
+        ]
+        assert 'offset=2' in data['next'] and 'count=false' in data['next']
+
+        last = client.get(
+            self.TITLES_URL, {'count': 'false', 'limit': 2, 'offset': 4}
+        ).json()
+        assert last['next'] is None, (
+            'На последней странице ссылка `next` должна быть пустой.'
+        )
+        assert 'offset=2' in last['previous']
+
+    def test_02_estimated_count(self, client, titles):
+        params = {'count': 'estimate', 'limit': 2}
+        assert client.get(self.TITLES_URL, params).json()['count'] == 5
+        Title.objects.filter(pk=titles[0].pk).delete()
+        data = client.get(self.TITLES_URL, params).json()
+        assert data['count'] == 5, (
+            'При `?count=estimate` количество должно браться из кэша.'
+        )
+        assert len(data['results']) == 2 and data['next'] is not None
+        assert client.get(self.TITLES_URL).json()['count'] == 4, (
+            'По умолчанию количество должно быть точным.'
+        )
+
+    def test_03_conditional_get_without_count(self, client, titles):
+        params = {'count': 'false', 'limit': 2}
+        response = client.get(self.TITLES_URL, params)
+        assert client.get(
+            self.TITLES_URL, params, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code == HTTPStatus.NOT_MODIFIED
+        titles[4].delete()
+        assert client.get(
+            self.TITLES_URL, params, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code == HTTPStatus.OK, (
+            'Изменение состава страницы должно менять ETag.'
+        )
+
+    def test_04_other_lists(self, client):
+        Genre.objects.create(name='Драма', slug='drama')
+        data = client.get(self.GENRES_URL, {'count': 'false'}).json()
+        assert 'count' not in data
+        assert [genre['slug'] for genre in data['results']] == ['drama']
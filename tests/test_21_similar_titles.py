@@ -0,0 +1,133 @@
+import math
+from http import HTTPStatus
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+
+from reviews import recommendations
+from reviews.models import Review, SimilarTitle, Title
+
+SCORES = {
+    'first': {'A': 10, 'B': 9, 'C': 2},
+    'second': {'A': 8, 'B': 9, 'C': 3},
+    'third': {'A': 3, 'B': 2, 'C': 9, 'D': 8},
+    'fourth': {'A': 2, 'C': 10, 'D': 9},
+}
+
+
+def adjusted_cosine(scores, left, right):
+    """Эталонный расчёт сходства в лоб."""
+    centered = {}
+    for author, marks in scores.items():
+        mean = sum(marks.values()) / len(marks)
+        for title, score in marks.items():
+            centered[author, title] = score - mean
+
+    def norm(title):
+        return math.sqrt(sum(
+            value ** 2 for (_, name), value in centered.items()
+            if name == title
+        ))
+
+    dot = sum(
+        centered[author, left] * centered[author, right]
+        for author in scores
+        if (author, left) in centered and (author, right) in centered
+    )
+    return dot / (norm(left) * norm(right))
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21SimilarTitles:
+
+    SIMILAR_URL_TEMPLATE = '/api/v1/titles/{title_id}/similar/'
+
+    @pytest.fixture
+    def titles(self, django_user_model):
+        titles = {
+            name: Title.objects.create(name=name, year=2000)
+            for name in 'ABCD'
+        }
+        for username, marks in SCORES.items():
+            author = django_user_model.objects.create(
+                username=username, email=f'{username}@yamdb.fake'
+            )
+            for name, score in marks.items():
+                Review.objects.create(title=titles[name], author=author,
+                                      text='Текст', score=score)
+        return titles
+
+    def test_01_build(self, titles, monkeypatch):
+        # мелкие порции чтения и блоки расчёта не должны влиять на результат
+        monkeypatch.setattr(recommendations, 'MAX_PAIRS_PER_BATCH', 5)
+        call_command('build_similar_titles', chunk_size=3)
+        stored = {
+            (row.title.name, row.similar.name): row.score
+            for row in SimilarTitle.objects.select_related('title', 'similar')
+        }
+        assert stored, 'Команда должна сохранить похожие произведения.'
+        for (left, right), score in stored.items():
+            assert score == pytest.approx(
+                adjusted_cosine(SCORES, left, right)
+            ), f'Неверное сходство для пары {left} и {right}.'
+        assert ('A', 'B') in stored and ('C', 'D') in stored
+        assert ('A', 'C') not in stored, (
+            'Пары с отрицательным сходством не должны сохраняться.'
+        )
+
+    def test_02_endpoint(self, client, titles):
+        call_command('build_similar_titles')
+        response = client.get(
+            self.SIMILAR_URL_TEMPLATE.format(title_id=titles['A'].id)
+        )
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert [title['name'] for title in data] == ['B'], (
+            'Эндпоинт должен возвращать похожие произведения.'
+        )
+        assert data[0]['similarity'] == pytest.approx(
+            adjusted_cosine(SCORES, 'A', 'B'), abs=1e-4
+        )
+        assert {'id', 'name', 'genre', 'category'} <= set(data[0])
+        assert client.get(
+            self.SIMILAR_URL_TEMPLATE.format(title_id=0)
+        ).status_code == HTTPStatus.NOT_FOUND
+
+    def test_03_incremental(self, titles, django_user_model):
+        call_command('build_similar_titles')
+        untouched = SimilarTitle.objects.get(
+            title__name='C', similar__name='D'
+        )
+        author = django_user_model.objects.get(username='fourth')
+        Review.objects.create(title=titles['B'], author=author,
+                              text='Текст', score=1)
+        call_command('build_similar_titles', incremental=True)
+
+        scores = {**SCORES, 'fourth': {**SCORES['fourth'], 'B': 1}}
+        refreshed = SimilarTitle.objects.get(
+            title__name='A', similar__name='B'
+        )
+        assert refreshed.score == pytest.approx(
+            adjusted_cosine(scores, 'A', 'B')
+        ), 'Соседи изменённого произведения должны пересчитываться.'
+        assert SimilarTitle.objects.get(pk=untouched.pk).computed_at == (
+            untouched.computed_at
+        ), 'Неизменённые произведения не должны пересчитываться.'
+
+    def test_04_sparse_fields_bypass_cache(self, client, titles):
+        cache.clear()
+        call_command('build_similar_titles')
+        url = self.SIMILAR_URL_TEMPLATE.format(title_id=titles['A'].id)
+        data = client.get(url, {'fields': 'id'}).json()
+        assert set(data[0]) == {'id', 'similarity'}
+        data = client.get(url, {'include': 'score_histogram'}).json()
+        assert 'score_histogram' in data[0]
+        listed = {
+            title['name']: title
+            for title in client.get('/api/v1/titles/').json()['results']
+        }
+        assert {'id', 'name', 'genre', 'category'} <= set(listed['B']), (
+            'Выборка полей в /similar/ не должна попадать в кэш фрагментов.'
+        )
+        assert 'score_histogram' not in listed['B']
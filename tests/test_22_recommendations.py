@@ -0,0 +1,121 @@
+import os
+from http import HTTPStatus
+
+import numpy as np
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews import recommendations
+from reviews.models import Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22Recommendations:
+
+    RECOMMENDED_URL = '/api/v1/titles/recommended/'
+
+    @pytest.fixture(autouse=True)
+    def factors_dir(self, settings, tmp_path):
+        settings.RECOMMENDATION_FACTORS_DIR = str(tmp_path)
+        settings.RECOMMENDATION_RANK = 2
+        settings.RECOMMENDATION_ITERATIONS = 20
+        return tmp_path
+
+    @pytest.fixture
+    def titles(self, user, django_user_model):
+        titles = [
+            Title.objects.create(name=f'Произведение {i}', year=2000)
+            for i in range(4)
+        ]
+        # два вкуса: любители первых двух и последних двух произведений
+        for number in range(6):
+            author = django_user_model.objects.create(
+                username=f'reader{number}', email=f'reader{number}@yamdb.fake'
+            )
+            liked = titles[:2] if number % 2 else titles[2:]
+            disliked = titles[2:] if number % 2 else titles[:2]
+            for title in liked:
+                Review.objects.create(title=title, author=author,
+                                      text='Текст', score=10)
+            for title in disliked:
+                Review.objects.create(title=title, author=author,
+                                      text='Текст', score=2)
+        Review.objects.create(title=titles[0], author=user, text='Текст',
+                              score=10)
+        return titles
+
+    def test_01_training(self, titles, factors_dir):
+        matrix = recommendations.load_reviews(chunk_size=5)
+        mean, users, items = recommendations.train_factors(
+            matrix, rank=2, iterations=20, regularization=0.1
+        )
+        predicted = (
+            users[matrix.user_index] * items[matrix.title_index]
+        ).sum(axis=1) + mean
+        assert np.abs(predicted - matrix.scores).mean() < 1.5, (
+            'Разложение должно приближать известные оценки.'
+        )
+
+        call_command('train_recommendations')
+        call_command('train_recommendations')
+        call_command('train_recommendations')
+        link = os.path.join(factors_dir, recommendations.FACTORS_LINK)
+        assert os.path.islink(link)
+        versions = [
+            name for name in os.listdir(factors_dir)
+            if name != recommendations.FACTORS_LINK
+        ]
+        assert len(versions) == 2, (
+            'Старые версии факторов должны удаляться, кроме предыдущей.'
+        )
+        factors = recommendations.factor_store.get(factors_dir)
+        assert isinstance(factors.title_factors, np.memmap), (
+            'Факторы должны отображаться в память, а не копироваться.'
+        )
+
+    def test_02_endpoint(self, user_client, user, titles):
+        call_command('train_recommendations')
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(self.RECOMMENDED_URL)
+        assert response.status_code == HTTPStatus.OK
+        assert not any(
+            word in query['sql']
+            for query in context.captured_queries
+            for word in ('COUNT(', 'SUM(', 'AVG(', 'MAX(')
+        ), 'При запросе рекомендаций агрегаты в БД не считаются.'
+        data = response.json()
+        names = [title['name'] for title in data]
+        assert titles[0].name not in names, (
+            'Произведения, на которые есть отзыв, не рекомендуются.'
+        )
+        assert names[0] == titles[1].name, (
+            'Первым должно идти произведение, близкое по вкусу.'
+        )
+        assert data[0]['predicted_score'] > data[-1]['predicted_score']
+
+    def test_03_fallback(self, user_client, titles, client):
+        assert client.get(self.RECOMMENDED_URL).status_code == (
+            HTTPStatus.UNAUTHORIZED
+        )
+        # факторов ещё нет: лучшие по рейтингу без уже оценённых
+        data = user_client.get(self.RECOMMENDED_URL).json()
+        assert [title['id'] for title in data] and all(
+            title['predicted_score'] is None for title in data
+        )
+        assert titles[0].id not in [title['id'] for title in data]
+
+    def test_04_sparse_fields_bypass_cache(self, user_client, titles, client):
+        cache.clear()
+        call_command('train_recommendations')
+        data = user_client.get(self.RECOMMENDED_URL, {'fields': 'id'}).json()
+        assert data and all(
+            set(title) == {'id', 'predicted_score'} for title in data
+        )
+        listed = client.get('/api/v1/titles/').json()['results']
+        assert all(
+            {'id', 'name', 'genre', 'category'} <= set(title)
+            for title in listed
+        ), 'Выборка полей в /recommended/ не должна попадать в кэш фрагментов.'
@@ -0,0 +1,137 @@
+import os
+import subprocess
+import sys
+from http import HTTPStatus
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.autocomplete import autocomplete
+from api.cache import shared_cache
+from reviews.models import Category, Genre, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test23Autocomplete:
+
+    URL = '/api/v1/autocomplete/'
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        cache.clear()
+        shared_cache.clear()
+        # индексы процесса остались от прошлого теста
+        autocomplete.bump()
+        yield
+        cache.clear()
+        shared_cache.clear()
+
+    @pytest.fixture
+    def titles(self, user):
+        category = Category.objects.create(name='Мультфильм', slug='cartoon')
+        genre = Genre.objects.create(name='Мюзикл', slug='musical')
+        matrix = Title.objects.create(name='Матрица', year=1999,
+                                      category=category)
+        matrix.genre.set([genre])
+        dark = Title.objects.create(name='Тёмная материя', year=2005)
+        Title.objects.create(name='Солярис', year=1972)
+        Review.objects.create(title=dark, author=user, text='Текст', score=8)
+        return matrix, dark
+
+    def names(self, client, query, **params):
+        response = client.get(self.URL, {'q': query, **params})
+        assert response.status_code == HTTPStatus.OK
+        return [title['name'] for title in response.json()['titles']]
+
+    def test_01_prefix_and_ranking(self, client, titles):
+        assert self.names(client, 'МАТ') == ['Тёмная материя', 'Матрица'], (
+            'Подсказки ищутся по началу любого слова без учёта регистра и '
+            'упорядочены по числу отзывов.'
+        )
+        assert self.names(client, 'темн') == ['Тёмная материя']
+        assert self.names(client, 'мат', limit=1) == ['Тёмная материя']
+        data = client.get(self.URL, {'q': 'м'}).json()
+        assert data['genres'] == [{'name': 'Мюзикл', 'slug': 'musical'}]
+        assert data['categories'] == [
+            {'name': 'Мультфильм', 'slug': 'cartoon'}
+        ]
+        assert client.get(self.URL, {'q': 'мюз'}).json()['categories'] == []
+        assert client.get(self.URL).status_code == HTTPStatus.BAD_REQUEST
+
+    def test_02_no_queries_when_warm(self, client, titles,
+                                     django_assert_num_queries):
+        self.names(client, 'мат')
+        with django_assert_num_queries(0):
+            self.names(client, 'матр')
+
+    def test_03_incremental_updates(self, client, titles, user,
+                                    django_user_model):
+        matrix, dark = titles
+        self.names(client, 'мат')
+
+        Title.objects.create(name='Матильда', year=2017)
+        assert 'Матильда' in self.names(client, 'мат'), (
+            'Новое произведение должно появиться в подсказках.'
+        )
+        matrix.name = 'Начало'
+        matrix.save()
+        assert 'Матрица' not in self.names(client, 'мат')
+        assert self.names(client, 'нач') == ['Начало']
+
+        other = django_user_model.objects.create(username='other',
+                                                 email='other@yamdb.fake')
+        matilda = Title.objects.get(name='Матильда')
+        for author in (user, other):
+            Review.objects.create(title=matilda, author=author,
+                                  text='Текст', score=9)
+        assert self.names(client, 'мат')[0] == 'Матильда', (
+            'Порядок подсказок должен учитывать новые отзывы.'
+        )
+
+        dark.delete()
+        assert self.names(client, 'мат') == ['Матильда'], (
+            'Удалённое произведение не должно попадать в подсказки.'
+        )
+        Genre.objects.create(name='Мелодрама', slug='melodrama')
+        assert [
+            genre['slug'] for genre in client.get(
+                self.URL, {'q': 'ме'}
+            ).json()['genres']
+        ] == ['melodrama']
+
+    def test_04_change_from_other_process(self, client, titles, settings,
+                                          shared_cache_dir):
+        settings.LOOKUP_VERSION_CHECK_INTERVAL = 0
+        matrix, _ = titles
+        self.names(client, 'мат')
+        # запись в обход сигналов; об изменении сообщает другой процесс
+        Title.objects.filter(pk=matrix.pk).update(
+            name='Начало', updated_at=timezone.now()
+        )
+        subprocess.run(
+            (sys.executable, 'manage.py', 'shell', '-c',
+             'from api.autocomplete import autocomplete; '
+             'autocomplete.mark_changed()'),
+            cwd=settings.BASE_DIR, check=True,
+            env={**os.environ, 'SHARED_CACHE_DIR': shared_cache_dir}
+        )
+        assert self.names(client, 'нач') == ['Начало'], (
+            'Изменения, отмеченные другим процессом, должны попадать в '
+            'подсказки.'
+        )
+
+    def test_05_review_keeps_names(self, client, titles, user):
+        matrix, _ = titles
+        self.names(client, 'мат')
+        Review.objects.create(title=matrix, author=user, text='Текст',
+                              score=5)
+        with CaptureQueriesContext(connection) as context:
+            self.names(client, 'мат')
+        assert not any(
+            table in query['sql']
+            for query in context.captured_queries
+            for table in ('"reviews_genre"', '"reviews_category"')
+        ), 'Новый отзыв не должен перечитывать жанры и категории.'
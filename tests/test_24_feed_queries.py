@@ -0,0 +1,152 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comment, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test24FeedQueries:
+
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+    COMMENTS_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+    )
+
+    @pytest.fixture
+    def review(self, django_user_model):
+        title = Title.objects.create(name='Титаник', year=1997)
+        authors = [
+            django_user_model.objects.create(
+                username=f'reader{i}', email=f'reader{i}@yamdb.fake'
+            )
+            for i in range(6)
+        ]
+        reviews = [
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=5)
+            for author in authors
+        ]
+        for author in authors:
+            Comment.objects.create(review=reviews[0], author=author,
+                                   text='Комментарий')
+        return reviews[0]
+
+    @pytest.mark.parametrize('limit', (1, 6))
+    def test_01_review_list(self, client, review, limit,
+                            django_assert_num_queries):
+        # агрегат для ETag и страница с авторами
+        with django_assert_num_queries(2):
+            response = client.get(
+                self.REVIEWS_URL_TEMPLATE.format(title_id=review.title_id),
+                {'limit': limit}
+            )
+        results = response.json()['results']
+        assert len(results) == limit
+        assert all(item['author'].startswith('reader') for item in results)
+
+    @pytest.mark.parametrize('limit', (1, 6))
+    def test_02_comment_list(self, client, review, limit,
+                             django_assert_num_queries):
+        with django_assert_num_queries(2):
+            response = client.get(
+                self.COMMENTS_URL_TEMPLATE.format(
+                    title_id=review.title_id, review_id=review.id
+                ),
+                {'limit': limit}
+            )
+        assert len(response.json()['results']) == limit
+
+    def test_03_missing_parent(self, client, review):
+        assert client.get(
+            self.REVIEWS_URL_TEMPLATE.format(title_id=review.title_id + 1)
+        ).status_code == HTTPStatus.NOT_FOUND, (
+            'Для несуществующего произведения должен возвращаться 404.'
+        )
+        assert client.get(
+            self.COMMENTS_URL_TEMPLATE.format(
+                title_id=review.title_id + 1, review_id=review.id
+            )
+        ).status_code == HTTPStatus.NOT_FOUND, (
+            'Отзыв другого произведения не должен находиться.'
+        )
+        other = Review.objects.exclude(pk=review.pk).first()
+        response = client.get(self.COMMENTS_URL_TEMPLATE.format(
+            title_id=review.title_id, review_id=other.id
+        ))
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['results'] == [], (
+            'Пустой список комментариев существующего отзыва — не ошибка.'
+        )
+
+    @staticmethod
+    def selects_from(context, table):
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and f'FROM "{table}"' in query['sql']
+        ]
+
+    def test_04_parent_loaded_once(self, user_client, review):
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(
+                self.REVIEWS_URL_TEMPLATE.format(title_id=review.title_id),
+                data={'text': 'Отзыв', 'score': 7}
+            )
+        assert response.status_code == HTTPStatus.CREATED
+        assert len(self.selects_from(context, 'reviews_title')) == 1, (
+            'При создании отзыва произведение должно загружаться один раз.'
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(
+                self.COMMENTS_URL_TEMPLATE.format(
+                    title_id=review.title_id, review_id=review.id
+                ),
+                data={'text': 'Комментарий'}
+            )
+        assert response.status_code == HTTPStatus.CREATED
+        assert len(self.selects_from(context, 'reviews_review')) == 1, (
+            'При создании комментария отзыв должен загружаться один раз.'
+        )
+
+    def test_05_unique_checked_by_database(self, user_client, admin_client,
+                                           review, user):
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=review.title_id)
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(url, data={'text': 'Отзыв',
+                                                   'score': 7})
+        assert response.status_code == HTTPStatus.CREATED
+        assert not self.selects_from(context, 'reviews_review'), (
+            'Перед созданием отзыва не нужно проверять уникальность запросом.'
+        )
+        response = user_client.post(url, data={'text': 'Ещё', 'score': 1})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {'non_field_errors': [
+            'Вы уже оставили отзыв на это произведение.'
+        ]}
+        assert Review.objects.filter(author=user).count() == 1
+
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.post('/api/v1/users/', data={
+                'username': 'newcomer', 'email': 'newcomer@yamdb.fake'
+            })
+        assert response.status_code == HTTPStatus.CREATED
+        assert not self.selects_from(context, 'users_user')[1:], (
+            'Уникальность username и email проверяется ограничением БД.'
+        )
+        response = admin_client.post('/api/v1/users/', data={
+            'username': user.username, 'email': 'new@yamdb.fake'
+        })
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert set(response.json()) == {'username'}, (
+            'Нарушение уникальности поля должно относиться к этому полю.'
+        )
+        response = admin_client.post('/api/v1/users/', data={
+            'username': user.username, 'email': user.email
+        })
+        assert set(response.json()) == {'username', 'email'}, (
+            'Если заняты и username, и email, в ответе должны быть оба поля.'
+        )
@@ -0,0 +1,53 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comment, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test25FeedIndexes:
+
+    @pytest.fixture
+    def review(self, user):
+        title = Title.objects.create(name='Титаник', year=1997)
+        review = Review.objects.create(title=title, author=user,
+                                       text='Отзыв', score=5)
+        Comment.objects.create(review=review, author=user,
+                               text='Комментарий')
+        return review
+
+    @staticmethod
+    def list_plans(client, url):
+        """Планы всех запросов, выполненных при получении списка."""
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans[query['sql']] = [row[-1] for row in cursor.fetchall()]
+        return plans
+
+    @pytest.mark.parametrize('url_template, index', (
+        ('/api/v1/titles/{title_id}/reviews/', 'review_feed_idx'),
+        ('/api/v1/titles/{title_id}/reviews/{review_id}/comments/',
+         'comment_feed_idx'),
+    ))
+    def test_01_feed_uses_index(self, client, review, url_template, index):
+        plans = self.list_plans(client, url_template.format(
+            title_id=review.title_id, review_id=review.id
+        ))
+        for sql, plan in plans.items():
+            assert not any('TEMP B-TREE' in step for step in plan), (
+                f'Лента не должна сортироваться во временном дереве: {sql}'
+            )
+            assert not any(step.startswith('SCAN') for step in plan), (
+                f'Лента не должна читать таблицу целиком: {sql}'
+            )
+        page_plans = [
+            plan for sql, plan in plans.items() if 'ORDER BY' in sql
+        ]
+        assert page_plans and all(
+            any(index in step for step in plan) for plan in page_plans
+        ), f'Страница ленты должна читаться по индексу {index}.'
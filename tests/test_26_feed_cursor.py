@@ -0,0 +1,116 @@
+import base64
+import json
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reviews.models import Comment, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test26FeedCursor:
+
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+    COMMENTS_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+    )
+
+    @pytest.fixture
+    def reviews(self, django_user_model):
+        title = Title.objects.create(name='Титаник', year=1997)
+        authors = [
+            django_user_model.objects.create(
+                username=f'reader{i}', email=f'reader{i}@yamdb.fake'
+            )
+            for i in range(7)
+        ]
+        reviews = [
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=5)
+            for author in authors
+        ]
+        # одинаковые даты: порядок внутри них задаёт id
+        Review.objects.filter(pk__in=[r.pk for r in reviews[2:5]]).update(
+            pub_date=timezone.now()
+        )
+        for author in authors:
+            Comment.objects.create(review=reviews[0], author=author,
+                                   text='Комментарий')
+        return reviews
+
+    @staticmethod
+    def walk(client, url, limit):
+        data = client.get(url, {'cursor': '', 'limit': limit}).json()
+        assert 'count' not in data, (
+            'В режиме курсора общее число записей не возвращается.'
+        )
+        ids = [item['id'] for item in data['results']]
+        while data['next']:
+            data = client.get(data['next']).json()
+            ids.extend(item['id'] for item in data['results'])
+        return ids
+
+    def test_01_walk(self, client, reviews):
+        title_id = reviews[0].title_id
+        expected = list(Review.objects.filter(title_id=title_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+        assert self.walk(
+            client, self.REVIEWS_URL_TEMPLATE.format(title_id=title_id), 3
+        ) == expected, (
+            'Курсор должен проходить отзывы от новых к старым без повторов '
+            'и пропусков, в том числе при равной дате публикации.'
+        )
+        expected = list(reviews[0].comments.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+        assert self.walk(client, self.COMMENTS_URL_TEMPLATE.format(
+            title_id=title_id, review_id=reviews[0].id
+        ), 2) == expected
+
+    def test_02_stable_under_inserts(self, client, reviews, user):
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=reviews[0].title_id)
+        first = client.get(url, {'cursor': '', 'limit': 3}).json()
+        Review.objects.create(title=reviews[0].title, author=user,
+                              text='Новый отзыв', score=9)
+        second = client.get(first['next']).json()
+        seen = [item['id'] for item in first['results']]
+        assert not set(seen) & {item['id'] for item in second['results']}, (
+            'Новые отзывы не должны сдвигать следующую страницу курсора.'
+        )
+
+    def test_03_no_count_query(self, client, reviews):
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=reviews[0].title_id)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, {'cursor': '', 'limit': 3})
+        assert response.status_code == HTTPStatus.OK
+        assert len(context.captured_queries) == 1 and not any(
+            'COUNT(' in query['sql'] for query in context.captured_queries
+        ), 'Страница по курсору читается одним запросом без COUNT.'
+        assert client.get(url).json()['count'] == len(reviews), (
+            'Без параметра cursor пагинация остаётся прежней.'
+        )
+        assert client.get(
+            url, {'cursor': 'garbage'}
+        ).status_code == HTTPStatus.NOT_FOUND
+
+    @pytest.mark.parametrize('position', (['notadate', 1],
+                                          [None, None]))
+    def test_04_wrongly_typed_cursor(self, client, reviews, position):
+        cursor = base64.urlsafe_b64encode(
+            json.dumps({'p': position, 'r': 0}).encode()
+        ).decode()
+        for url in (
+            self.REVIEWS_URL_TEMPLATE.format(title_id=reviews[0].title_id),
+            self.COMMENTS_URL_TEMPLATE.format(
+                title_id=reviews[0].title_id, review_id=reviews[0].id
+            ),
+        ):
+            assert client.get(
+                url, {'cursor': cursor}
+            ).status_code == HTTPStatus.NOT_FOUND, (
+                'Курсор с неверной датой должен давать 404.'
+            )
@@ -0,0 +1,109 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Comment, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test27CommentsPreview:
+
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+    COMMENTS_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+    )
+
+    @pytest.fixture
+    def reviews(self, django_user_model):
+        title = Title.objects.create(name='Титаник', year=1997)
+        authors = [
+            django_user_model.objects.create(
+                username=f'reader{i}', email=f'reader{i}@yamdb.fake'
+            )
+            for i in range(4)
+        ]
+        reviews = [
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=5)
+            for author in authors
+        ]
+        for number, review in enumerate(reviews):
+            for author in authors[:number]:
+                Comment.objects.create(review=review, author=author,
+                                       text=f'От {author.username}')
+        return reviews
+
+    def test_01_comment_count(self, user_client, reviews):
+        review = reviews[0]
+        url = self.COMMENTS_URL_TEMPLATE.format(
+            title_id=review.title_id, review_id=review.id
+        )
+        response = user_client.post(url, data={'text': 'Комментарий'})
+        assert response.status_code == HTTPStatus.CREATED
+        review.refresh_from_db()
+        assert review.comment_count == 1, (
+            'Создание комментария должно увеличивать счётчик отзыва.'
+        )
+        user_client.delete(f'{url}{response.json()["id"]}/')
+        review.refresh_from_db()
+        assert review.comment_count == 0, (
+            'Удаление комментария должно уменьшать счётчик отзыва.'
+        )
+        data = user_client.get(self.REVIEWS_URL_TEMPLATE.format(
+            title_id=review.title_id
+        )).json()
+        assert {
+            item['id']: item['comment_count'] for item in data['results']
+        } == {item.id: item.comments.count() for item in reviews}
+        assert 'comments_preview' not in data['results'][0], (
+            'Превью комментариев возвращается только по запросу.'
+        )
+
+    def test_02_preview(self, client, reviews):
+        data = client.get(
+            self.REVIEWS_URL_TEMPLATE.format(title_id=reviews[0].title_id),
+            {'include': 'comments_preview'}
+        ).json()
+        previews = {
+            item['id']: [comment['id'] for comment in item['comments_preview']]
+            for item in data['results']
+        }
+        assert previews == {
+            review.id: list(review.comments.order_by(
+                '-pub_date', '-id'
+            ).values_list('id', flat=True)[:2])
+            for review in reviews
+        }, 'В превью должны попадать два последних комментария отзыва.'
+        assert {'id', 'text', 'author', 'pub_date'} == set(
+            data['results'][0]['comments_preview'][0]
+        )
+        data = client.get(
+            self.REVIEWS_URL_TEMPLATE.format(title_id=reviews[0].title_id)
+            + f'{reviews[-1].id}/',
+            {'include': 'comments_preview'}
+        ).json()
+        assert len(data['comments_preview']) == 2
+
+    @pytest.mark.parametrize('limit', (1, 4))
+    def test_03_preview_queries(self, client, reviews, limit,
+                                django_assert_num_queries):
+        # агрегат для ETag, страница с авторами и все превью одним запросом
+        with django_assert_num_queries(3):
+            response = client.get(
+                self.REVIEWS_URL_TEMPLATE.format(
+                    title_id=reviews[0].title_id
+                ),
+                {'include': 'comments_preview', 'limit': limit}
+            )
+        assert len(response.json()['results']) == limit
+
+    def test_04_stale_comment_delete(self, reviews):
+        review = reviews[-1]
+        comment = review.comments.first()
+        stale = Comment.objects.get(pk=comment.pk)
+        comment.delete()
+        stale.delete()
+        review.refresh_from_db()
+        assert review.comment_count == review.comments.count() == 2, (
+            'Повторное удаление комментария не должно менять счётчик.'
+        )
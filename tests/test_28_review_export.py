@@ -0,0 +1,87 @@
+import csv
+import json
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.utils import timezone
+
+from reviews.models import Comment, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test28ReviewExport:
+
+    URL = '/api/v1/export/reviews/'
+
+    @pytest.fixture
+    def reviews(self, django_user_model):
+        title = Title.objects.create(name='Титаник', year=1997)
+        reviews = []
+        for number in range(5):
+            author = django_user_model.objects.create(
+                username=f'reader{number}', email=f'reader{number}@yamdb.fake'
+            )
+            review = Review.objects.create(title=title, author=author,
+                                           text=f'Отзыв, "{number}"',
+                                           score=number + 1)
+            Comment.objects.create(review=review, author=author,
+                                   text='Комментарий')
+            reviews.append(review)
+        return reviews
+
+    @staticmethod
+    def content(response):
+        assert response.streaming, 'Выгрузка должна отдаваться потоком.'
+        return b''.join(response.streaming_content).decode()
+
+    def records(self, response):
+        return [
+            json.loads(line) for line in self.content(response).splitlines()
+        ]
+
+    def test_01_ndjson(self, moderator_client, reviews, settings):
+        settings.EXPORT_CHUNK_SIZE = 2
+        response = moderator_client.get(self.URL, {'include': 'comments'})
+        assert response.status_code == HTTPStatus.OK
+        assert response['Content-Type'].startswith('application/x-ndjson')
+        records = self.records(response)
+        reviews_out = [r for r in records if r['type'] == 'review']
+        assert [r['id'] for r in reviews_out] == [r.id for r in reviews], (
+            'Выгрузка должна содержать все отзывы в порядке изменения.'
+        )
+        assert reviews_out[0]['author'] == 'reader0'
+        assert reviews_out[0]['comment_count'] == 1
+        assert len([r for r in records if r['type'] == 'comment']) == 5
+        assert all(
+            r['type'] == 'review'
+            for r in self.records(moderator_client.get(self.URL))
+        ), 'Комментарии выгружаются только по ?include=comments.'
+
+    def test_02_csv_and_since(self, admin_client, reviews):
+        since = timezone.now()
+        reviews[1].text = 'Изменён'
+        reviews[1].save()
+        rows = list(csv.DictReader(self.content(admin_client.get(
+            self.URL, {'output': 'csv'}
+        )).splitlines()))
+        assert len(rows) == len(reviews)
+        assert rows[0]['text'] == 'Отзыв, "0"', (
+            'Текст с запятыми и кавычками должен экранироваться по CSV.'
+        )
+        rows = list(csv.DictReader(self.content(admin_client.get(
+            self.URL, {'output': 'csv', 'since': since.isoformat()}
+        )).splitlines()))
+        assert [row['id'] for row in rows] == [str(reviews[1].id)], (
+            'С параметром since выгружаются только изменённые записи.'
+        )
+        assert admin_client.get(self.URL, {
+            'since': (since + timedelta(days=1)).isoformat()
+        }).streaming
+        assert admin_client.get(
+            self.URL, {'output': 'xml'}
+        ).status_code == HTTPStatus.BAD_REQUEST
+
+    def test_03_permissions(self, client, user_client, reviews):
+        assert client.get(self.URL).status_code == HTTPStatus.UNAUTHORIZED
+        assert user_client.get(self.URL).status_code == HTTPStatus.FORBIDDEN